@@ -1,32 +1,46 @@
 """Markdown-aware text chunking."""
 
 import re
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from itertools import chain
+from pathlib import Path
 from typing import Iterator
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Chunk:
-    """A chunk of text with metadata."""
+    """A chunk of text with metadata.
+    
+    Slotted and immutable: chunks are created in bulk and buffered before
+    upsert, so they stay small, and they can be hashed for deduplication.
+    """
     
     text: str
     heading: str | None = None      # Current heading context
     line_start: int = 0             # Starting line number (1-indexed)
     line_end: int = 0               # Ending line number (1-indexed)
     chunk_index: int = 0            # Index within the file
+    char_count: int = field(init=False, repr=False, compare=False)
     
-    @property
-    def char_count(self) -> int:
-        return len(self.text)
+    def __post_init__(self):
+        object.__setattr__(self, "char_count", len(self.text))
 
 
 class MarkdownChunker:
     """Chunks markdown content respecting structure."""
     
-    # Patterns for markdown structure
-    HEADING_PATTERN = re.compile(r'^(#{1,6})\s+(.+)$', re.MULTILINE)
-    CODE_BLOCK_PATTERN = re.compile(r'^```', re.MULTILINE)
-    FRONTMATTER_PATTERN = re.compile(r'^---\s*\n.*?\n---\s*\n', re.DOTALL)
+    # Lines that shape the chunking: a heading (1-6 '#', whitespace, then
+    # at least one character), a code fence, or a blank line.
+    STRUCTURE_LINE = (
+        r'(?:(?P<heading>#{1,6}[^\S\n][^\n]+)'
+        r'|(?P<code_fence>```[^\n]*)'
+        r'|(?P<blank>[^\S\n]*))(?![^\n])'
+    )
+    FIRST_LINE_PATTERN = re.compile(STRUCTURE_LINE)
+    # Leading with the newline lets the regex engine jump between line
+    # starts with a fast literal search; other lines are never inspected
+    # in Python.
+    STRUCTURE_PATTERN = re.compile(r'\n' + STRUCTURE_LINE)
     
     def __init__(
         self,
@@ -54,23 +68,18 @@ class MarkdownChunker:
         Yields:
             Chunk objects with text and metadata
         """
-        # Strip frontmatter
-        content = self._strip_frontmatter(content)
-        
-        # Split into sections by headings
-        sections = self._split_by_headings(content)
+        # Skip frontmatter without copying the rest of the content
+        body_start = self._frontmatter_end(content)
         
         chunk_index = 0
-        for section in sections:
-            heading = section.get("heading")
-            text = section["text"]
-            line_start = section["line_start"]
-            
+        sections = self._sections(content, body_start)
+        for heading, start, end, line_count, paragraphs, line_start in sections:
             # Further split large sections
-            for sub_chunk in self._split_section(text, line_start):
-                if len(sub_chunk["text"].strip()) >= self.min_chunk_size:
+            for sub_chunk in self._split_section(content, start, end, line_count, paragraphs, line_start):
+                text = sub_chunk["text"].strip()
+                if len(text) >= self.min_chunk_size:
                     yield Chunk(
-                        text=sub_chunk["text"].strip(),
+                        text=text,
                         heading=heading,
                         line_start=sub_chunk["line_start"],
                         line_end=sub_chunk["line_end"],
@@ -78,80 +87,242 @@ class MarkdownChunker:
                     )
                     chunk_index += 1
     
-    def _strip_frontmatter(self, content: str) -> str:
-        """Remove YAML frontmatter from content."""
-        match = self.FRONTMATTER_PATTERN.match(content)
-        if match:
-            return content[match.end():]
-        return content
+    def _frontmatter_end(self, content: str) -> int:
+        """Find where YAML frontmatter ends.
+        
+        Frontmatter runs from an opening '---' line to the next '---'
+        line, both allowing trailing whitespace. Whitespace-only lines
+        directly after the closing delimiter belong to it.
+        
+        Returns:
+            Offset of the first character after the frontmatter, or 0 if
+            the content has none
+        """
+        # Most notes have no frontmatter; a prefix check settles those
+        if not content.startswith('---'):
+            return 0
+        
+        n = len(content)
+        
+        # Opening delimiter may end at any newline in the whitespace after it;
+        # prefer the latest, as the greedy regex this replaces did
+        run_end = 3
+        while run_end < n and content[run_end].isspace():
+            run_end += 1
+        open_nl = content.rfind('\n', 3, run_end)
+        
+        while open_nl != -1:
+            idx = content.find('\n---', open_nl + 1)
+            while idx != -1:
+                # Closing delimiter must be followed by whitespace up to a newline
+                end = idx + 4
+                while end < n and content[end].isspace():
+                    end += 1
+                close_nl = content.rfind('\n', idx + 4, end)
+                if close_nl != -1:
+                    return close_nl + 1
+                idx = content.find('\n---', idx + 1)
+            open_nl = content.rfind('\n', 3, open_nl)
+        
+        return 0
+    
+    def _tokenize(self, content: str, start: int = 0) -> Iterator[tuple[str, int, int, int, int]]:
+        """Classify the lines of content[start:] in a single left-to-right scan.
+        
+        STRUCTURE_PATTERN finds headings, code fences and blank lines in one
+        C-level regex pass over the content; the plain text lines between them are reported
+        as runs, measured with str.count, so Python code never visits them
+        line by line. Code block state resets at every heading, since each
+        heading starts a new section.
+        
+        Yields:
+            (kind, start, end, first_line, last_line) where content[start:end]
+            spans the lines without the final newline and kind is 'heading',
+            'code_fence', 'blank' (outside code blocks) or 'text' (a run of
+            one or more other lines)
+        """
+        in_code_block = False
+        line_no = 1
+        text_start = start            # first offset not yet reported
+        
+        first = self.FIRST_LINE_PATTERN.match(content, start)
+        matches = self.STRUCTURE_PATTERN.finditer(content, start)
+        if first is not None:
+            matches = chain((first,), matches)
+        
+        for match in matches:
+            kind = match.lastgroup
+            if kind == 'blank' and in_code_block:
+                continue              # part of the surrounding text run
+            
+            pos = match.start(kind)
+            if pos > text_start:
+                last_line = line_no + content.count('\n', text_start, pos - 1)
+                yield 'text', text_start, pos - 1, line_no, last_line
+                line_no = last_line + 1
+            
+            if kind == 'heading':
+                in_code_block = False
+            elif kind == 'code_fence':
+                in_code_block = not in_code_block
+            
+            end = match.end(kind)
+            yield kind, pos, end, line_no, line_no
+            line_no += 1
+            text_start = end + 1
+        
+        if text_start <= len(content):
+            last_line = line_no + content.count('\n', text_start)
+            yield 'text', text_start, len(content), line_no, last_line
     
-    def _split_by_headings(self, content: str) -> list[dict]:
-        """Split content into sections by headings."""
-        lines = content.split('\n')
-        sections = []
-        current_section = {
-            "heading": None,
-            "text": "",
-            "line_start": 1,
-        }
-        
-        for i, line in enumerate(lines, start=1):
-            heading_match = self.HEADING_PATTERN.match(line)
-            if heading_match:
-                # Save current section if it has content
-                if current_section["text"].strip():
-                    sections.append(current_section)
+    def _sections(self, content: str, start: int = 0) -> Iterator[tuple]:
+        """Group tokenized lines of content[start:] into heading sections.
+        
+        Sections and paragraphs are recorded during the same scan as
+        offsets into content. Paragraphs are (start, end, line_count,
+        char_len), where char_len is the length of the paragraph text:
+        content[start:end] plus its trailing newline. A paragraph left
+        open inside an unclosed code block also keeps the section's
+        trailing newline, so its char_len is one more.
+        
+        Yields:
+            (heading, start, end, line_count, paragraphs, line_start) per
+            section with content; the section text is content[start:end]
+            plus a trailing newline
+        """
+        heading = None
+        section_start = start
+        section_end = start
+        line_start = 1
+        paragraphs: list[tuple[int, int, int, int]] = []
+        para_start = None             # offset where the open paragraph starts
+        para_line = 0                 # line number where it starts
+        para_end = 0                  # offset where its last line ends
+        last_line_no = 0
+        in_code_block = False
+        
+        for kind, pos, end, first_line, last_line in self._tokenize(content, start):
+            if kind == 'heading':
+                # Emit current section if it has content
+                if para_start is not None:
+                    paragraphs.append((
+                        para_start,
+                        para_end,
+                        last_line_no - para_line + 1,
+                        para_end - para_start + 1 + int(in_code_block),
+                    ))
+                if paragraphs:
+                    yield (heading, section_start, section_end,
+                           last_line_no - line_start + 1, paragraphs, line_start)
                 
                 # Start new section
-                current_section = {
-                    "heading": heading_match.group(2).strip(),
-                    "text": line + '\n',
-                    "line_start": i,
-                }
+                heading = content[pos:end].lstrip('#').strip()
+                section_start = pos
+                line_start = first_line
+                paragraphs = []
+                para_start = pos
+                para_line = first_line
+                in_code_block = False
+            elif kind == 'blank':
+                if para_start is not None:
+                    paragraphs.append((
+                        para_start,
+                        para_end,
+                        last_line_no - para_line + 1,
+                        para_end - para_start + 1,
+                    ))
+                    para_start = None
             else:
-                current_section["text"] += line + '\n'
+                if kind == 'code_fence':
+                    in_code_block = not in_code_block
+                if para_start is None:
+                    para_start = pos
+                    para_line = first_line
+            
+            if kind != 'blank':
+                para_end = end
+            section_end = end
+            last_line_no = last_line
         
         # Don't forget the last section
-        if current_section["text"].strip():
-            sections.append(current_section)
+        if para_start is not None:
+            paragraphs.append((
+                para_start,
+                para_end,
+                last_line_no - para_line + 1,
+                para_end - para_start + 1 + int(in_code_block),
+            ))
+        if paragraphs:
+            yield (heading, section_start, section_end,
+                   last_line_no - line_start + 1, paragraphs, line_start)
+    
+    @staticmethod
+    def _text(content: str, start: int, end: int, length: int) -> str:
+        """Text of length chars: content[start:end] padded with newlines.
         
-        return sections
+        Slices through the newline that ends the line in content when
+        possible, avoiding a concatenation.
+        """
+        padding = length - (end - start)
+        if padding == 1 and end < len(content):
+            return content[start:end + 1]
+        return content[start:end] + '\n' * padding
     
-    def _split_section(self, text: str, start_line: int) -> Iterator[dict]:
+    def _split_section(
+        self,
+        content: str,
+        section_start: int,
+        section_end: int,
+        line_count: int,
+        paragraphs: list[tuple[int, int, int, int]],
+        start_line: int,
+    ) -> Iterator[dict]:
         """Split a section into chunks respecting code blocks.
         
         Args:
-            text: Section text
+            content: Full content the offsets refer to
+            section_start: Offset where the section starts
+            section_end: Offset where the section's last line ends
+            line_count: Number of lines in the section
+            paragraphs: (start, end, line_count, char_len) of each paragraph, as from _sections
             start_line: Starting line number
             
         Yields:
             Dict with text, line_start, line_end
         """
-        if len(text) <= self.chunk_size:
-            lines = text.split('\n')
+        text_len = section_end - section_start + 1
+        if text_len <= self.chunk_size:
             yield {
-                "text": text,
+                "text": self._text(content, section_start, section_end, text_len),
                 "line_start": start_line,
-                "line_end": start_line + len(lines) - 1,
+                "line_end": start_line + line_count,
             }
             return
         
-        # Split by paragraphs first
-        paragraphs = self._split_paragraphs(text)
-        
-        current_chunk = ""
+        # Accumulate parts and join only when a chunk is emitted
+        current_parts: list[str] = []
+        current_len = 0
+        current_newlines = 0
         current_start = start_line
         current_line = start_line
         
-        for para in paragraphs:
-            para_lines = para.count('\n') + 1
+        for para_start, para_end, para_line_count, para_len in paragraphs:
+            para = self._text(content, para_start, para_end, para_len)
+            # para holds para_lines - 1 newlines; counts come from the scan
+            # rather than from rescanning the text
+            para_lines = para_line_count + para_len - (para_end - para_start)
             
-            if len(current_chunk) + len(para) <= self.chunk_size:
-                current_chunk += para
+            if current_len + para_len <= self.chunk_size:
+                current_parts.append(para)
+                current_len += para_len
+                current_newlines += para_lines - 1
                 current_line += para_lines
             else:
-                # Emit current chunk
-                if current_chunk.strip():
+                current_chunk = ''.join(current_parts)
+                
+                # Emit current chunk; it is only empty when the first
+                # paragraph alone exceeds chunk_size
+                if current_parts:
                     yield {
                         "text": current_chunk,
                         "line_start": current_start,
@@ -159,53 +330,75 @@ class MarkdownChunker:
                     }
                 
                 # Start new chunk with overlap
-                overlap_text = self._get_overlap(current_chunk)
-                current_chunk = overlap_text + para
-                current_start = current_line - overlap_text.count('\n')
+                overlap_text, overlap_lines = self._get_overlap(current_chunk, current_newlines)
+                current_parts = [overlap_text, para]
+                current_len = len(overlap_text) + para_len
+                current_newlines = overlap_lines + para_lines - 1
+                current_start = current_line - overlap_lines
                 current_line += para_lines
         
         # Emit remaining
-        if current_chunk.strip():
+        if current_parts:
             yield {
-                "text": current_chunk,
+                "text": ''.join(current_parts),
                 "line_start": current_start,
                 "line_end": current_line,
             }
     
-    def _split_paragraphs(self, text: str) -> list[str]:
-        """Split text into paragraphs, preserving code blocks."""
-        paragraphs = []
-        current = ""
-        in_code_block = False
+    def _get_overlap(self, text: str, newline_count: int) -> tuple[str, int]:
+        """Get overlap text from the end of a chunk.
         
-        for line in text.split('\n'):
-            if line.startswith('```'):
-                in_code_block = not in_code_block
-                current += line + '\n'
-            elif not in_code_block and line.strip() == '':
-                if current.strip():
-                    paragraphs.append(current)
-                current = ""
-            else:
-                current += line + '\n'
-        
-        if current.strip():
-            paragraphs.append(current)
+        The overlap starts after the last paragraph break in the overlap
+        window, else after the last sentence end, else after the last line
+        break. Separators in trailing whitespace are ignored, since
+        breaking there would leave no overlap at all.
         
-        return paragraphs
-    
-    def _get_overlap(self, text: str) -> str:
-        """Get overlap text from the end of a chunk."""
+        Args:
+            text: Chunk text
+            newline_count: Number of newlines in text, as tracked by the caller
+            
+        Returns:
+            (overlap_text, newline_count) so callers need not rescan it
+        """
         if len(text) <= self.chunk_overlap:
-            return text
+            return text, newline_count
         
-        # Try to break at sentence or paragraph boundary
         overlap_region = text[-self.chunk_overlap:]
+        end = len(overlap_region.rstrip())
         
-        # Look for sentence boundary
-        for sep in ['. ', '.\n', '\n\n', '\n']:
-            idx = overlap_region.find(sep)
+        # Scan from the right for the preferred boundary
+        for sep in ('\n\n', '. ', '.\n', '\n'):
+            idx = overlap_region.rfind(sep, 0, end)
             if idx != -1:
-                return overlap_region[idx + len(sep):]
+                overlap = overlap_region[idx + len(sep):]
+                return overlap, overlap.count('\n')
+        
+        return overlap_region, overlap_region.count('\n')
+
+
+def chunk_file(
+    path: Path,
+    chunker: MarkdownChunker,
+    content: str | None = None,
+) -> tuple[list[Chunk], str | None]:
+    """Read and chunk one file.
+    
+    Lives here rather than in the indexer so worker processes that run
+    it import only this module, not torch or the Qdrant client. Errors
+    are returned rather than raised so one bad file doesn't stop the
+    others.
+    
+    Args:
+        path: File to read when content isn't given
+        chunker: Chunker to split the text with
+        content: The file's text, if already read
         
-        return overlap_region
+    Returns:
+        (chunks, error) where error is None on success
+    """
+    try:
+        if content is None:
+            content = path.read_text(encoding='utf-8', errors='replace')
+        return list(chunker.chunk(content)), None
+    except Exception as e:
+        return [], str(e)
@@ -11,8 +11,6 @@ from rich.table import Table
 from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TaskProgressColumn
 
 from .config import VaultConfig, load_config
-from .indexer import VaultIndexer
-from .search import VaultSearcher
 
 
 console = Console()
@@ -39,10 +37,11 @@ def index(ctx, files: tuple, force: bool):
     """
     try:
         config = load_config(ctx.obj.get('config_path'))
-    except FileNotFoundError as e:
+    except (FileNotFoundError, ValueError) as e:
         console.print(f"[red]Error:[/red] {e}")
         sys.exit(1)
     
+    from .indexer import VaultIndexer
     indexer = VaultIndexer(config)
     
     files_list = list(files) if files else None
@@ -92,10 +91,11 @@ def search(ctx, query: str, limit: int, min_score: float, output_json: bool, pat
     """Search indexed vault content."""
     try:
         config = load_config(ctx.obj.get('config_path'))
-    except FileNotFoundError as e:
+    except (FileNotFoundError, ValueError) as e:
         console.print(f"[red]Error:[/red] {e}")
         sys.exit(1)
     
+    from .search import VaultSearcher
     searcher = VaultSearcher(config)
     
     with console.status("Searching..."):
@@ -140,10 +140,11 @@ def status(ctx):
     """Show index status."""
     try:
         config = load_config(ctx.obj.get('config_path'))
-    except FileNotFoundError as e:
+    except (FileNotFoundError, ValueError) as e:
         console.print(f"[red]Error:[/red] {e}")
         sys.exit(1)
     
+    from .indexer import VaultIndexer
     indexer = VaultIndexer(config)
     info = indexer.status()
     
@@ -174,7 +175,7 @@ def clear(ctx, yes: bool):
     """Clear all indexed data."""
     try:
         config = load_config(ctx.obj.get('config_path'))
-    except FileNotFoundError as e:
+    except (FileNotFoundError, ValueError) as e:
         console.print(f"[red]Error:[/red] {e}")
         sys.exit(1)
     
@@ -183,6 +184,7 @@ def clear(ctx, yes: bool):
             console.print("[yellow]Aborted.[/yellow]")
             return
     
+    from .indexer import VaultIndexer
     indexer = VaultIndexer(config)
     indexer.clear()
     
@@ -196,10 +198,11 @@ def delete(ctx, file_path: str):
     """Delete a specific file from the index."""
     try:
         config = load_config(ctx.obj.get('config_path'))
-    except FileNotFoundError as e:
+    except (FileNotFoundError, ValueError) as e:
         console.print(f"[red]Error:[/red] {e}")
         sys.exit(1)
     
+    from .indexer import VaultIndexer
     indexer = VaultIndexer(config)
     count = indexer.delete_file(file_path)
     
@@ -213,21 +216,24 @@ def delete(ctx, file_path: str):
 @click.argument('source_path')
 @click.option('--limit', '-n', default=10, help='Maximum number of results')
 @click.option('--json', 'output_json', is_flag=True, help='Output as JSON')
+@click.option('--average', '-a', is_flag=True, help='Compare using the mean of all chunks of the file')
 @click.pass_context
-def similar(ctx, source_path: str, limit: int, output_json: bool):
+def similar(ctx, source_path: str, limit: int, output_json: bool, average: bool):
     """Find content similar to a specific file."""
     try:
         config = load_config(ctx.obj.get('config_path'))
-    except FileNotFoundError as e:
+    except (FileNotFoundError, ValueError) as e:
         console.print(f"[red]Error:[/red] {e}")
         sys.exit(1)
     
+    from .search import VaultSearcher
     searcher = VaultSearcher(config)
     
     with console.status("Searching..."):
         results = searcher.search_by_path(
             source_path=source_path,
             limit=limit,
+            average=average,
         )
     
     if output_json:
@@ -5,6 +5,15 @@ from pathlib import Path
 from typing import Optional
 import yaml
 
+try:
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:  # PyYAML built without libyaml
+    from yaml import SafeLoader as YamlLoader
+
+
+QUANTIZATIONS = ("fp16", "int8", "none")
+CHUNK_EXECUTORS = ("process", "thread")
+
 
 @dataclass
 class VaultConfig:
@@ -17,10 +26,20 @@ class VaultConfig:
     # Qdrant connection
     qdrant_url: str = "http://localhost:6333"
     qdrant_api_key: Optional[str] = None
+    prefer_grpc: bool = False    # gRPC (port 6334) for data calls, else HTTP/2
+    qdrant_timeout: int = 60     # seconds per request
+    upload_concurrency: int = 2  # upserts in flight while indexing
+    upsert_batch_size: int = 256 # points per upsert, gathered across files
     
     # Embedding model
     model_name: str = "taylorai/bge-micro-v2"
     model_dimensions: int = 384
+    quantization: str = "fp16"   # vector storage: "fp16", "int8" or "none" (float32)
+    embedding_backend: str = "st"  # "st" (sentence-transformers) or "onnx" (int8, CPU)
+    embed_batch_size: int = 64   # texts per model batch, gathered across files
+    indexing_threshold: int = 20000  # Qdrant HNSW indexing threshold (KB of vectors)
+    embed_cache: bool = False    # reuse embeddings of chunk texts seen before
+    embed_cache_file: Optional[str] = None  # defaults to ~/.cache/vault-embedder/embeddings.sqlite
     
     # File filtering
     include_extensions: list[str] = field(default_factory=lambda: [".md"])
@@ -29,20 +48,36 @@ class VaultConfig:
         "_*",           # underscore prefixed
         "node_modules", # common excludes
     ])
+    max_file_bytes: int = 10 << 20  # skip larger files; 0 = no limit
+    skip_binary: bool = True     # skip files with NUL bytes near the start
     
     # Chunking
     chunk_size: int = 1000       # max characters per chunk
     chunk_overlap: int = 200     # overlap between chunks
     min_chunk_size: int = 100    # minimum chunk size to index
+    chunk_workers: int = 0       # workers chunking files; 0 = one per CPU
+    chunk_executor: str = "process"  # "process" or "thread" workers
+    load_workers: int = 0        # threads hashing files; 0 = two per CPU, at most 32
     
     # State tracking
     state_file: Optional[str] = None  # defaults to .vault-embedder-state.json in vault
     
+    def __post_init__(self):
+        """Reject settings a typo would otherwise silently replace.
+        
+        An unknown quantization would create a float32 collection without
+        quantization, which then stays that way.
+        """
+        if self.quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization '{self.quantization}', expected one of {QUANTIZATIONS}")
+        if self.chunk_executor not in CHUNK_EXECUTORS:
+            raise ValueError(f"Unknown chunk executor '{self.chunk_executor}', expected one of {CHUNK_EXECUTORS}")
+    
     @classmethod
     def from_yaml(cls, path: str | Path) -> "VaultConfig":
         """Load configuration from YAML file."""
         with open(path) as f:
-            data = yaml.safe_load(f)
+            data = yaml.load(f, Loader=YamlLoader)
         return cls(**data)
     
     @classmethod
@@ -57,16 +92,46 @@ class VaultConfig:
             "collection_name": self.collection_name,
             "qdrant_url": self.qdrant_url,
             "qdrant_api_key": self.qdrant_api_key,
+            "prefer_grpc": self.prefer_grpc,
+            "qdrant_timeout": self.qdrant_timeout,
+            "upload_concurrency": self.upload_concurrency,
+            "upsert_batch_size": self.upsert_batch_size,
             "model_name": self.model_name,
             "model_dimensions": self.model_dimensions,
+            "quantization": self.quantization,
+            "embedding_backend": self.embedding_backend,
+            "embed_batch_size": self.embed_batch_size,
+            "indexing_threshold": self.indexing_threshold,
+            "embed_cache": self.embed_cache,
+            "embed_cache_file": self.embed_cache_file,
             "include_extensions": self.include_extensions,
             "exclude_patterns": self.exclude_patterns,
+            "max_file_bytes": self.max_file_bytes,
+            "skip_binary": self.skip_binary,
             "chunk_size": self.chunk_size,
             "chunk_overlap": self.chunk_overlap,
             "min_chunk_size": self.min_chunk_size,
+            "chunk_workers": self.chunk_workers,
+            "chunk_executor": self.chunk_executor,
+            "load_workers": self.load_workers,
             "state_file": self.state_file,
         }
     
+    def qdrant_client_kwargs(self) -> dict:
+        """Keyword arguments for QdrantClient and AsyncQdrantClient.
+        
+        Clients hold one long-lived connection: gRPC with keepalive pings,
+        or in HTTP mode HTTP/2, which multiplexes concurrent requests.
+        """
+        return {
+            "url": self.qdrant_url,
+            "api_key": self.qdrant_api_key,
+            "prefer_grpc": self.prefer_grpc,
+            "timeout": self.qdrant_timeout,
+            "grpc_options": {"grpc.keepalive_time_ms": 30000},
+            "http2": True,
+        }
+    
     @property
     def vault(self) -> Path:
         """Get vault path as Path object."""
@@ -78,6 +143,17 @@ class VaultConfig:
         if self.state_file:
             return Path(self.state_file).expanduser().resolve()
         return self.vault / ".vault-embedder-state.json"
+    
+    @property
+    def embed_cache_path(self) -> Path:
+        """Get embedding cache file path."""
+        if self.embed_cache_file:
+            return Path(self.embed_cache_file).expanduser().resolve()
+        return Path.home() / ".cache" / "vault-embedder" / "embeddings.sqlite"
+
+
+# Config file found by load_config's search, reused for the rest of the process
+_resolved_config_path: Optional[Path] = None
 
 
 def load_config(config_path: Optional[str] = None) -> VaultConfig:
@@ -88,23 +164,39 @@ def load_config(config_path: Optional[str] = None) -> VaultConfig:
     2. VAULT_EMBEDDER_CONFIG environment variable
     3. ./config.yaml
     4. ~/.config/vault-embedder/config.yaml
+    
+    The path found for 2-4 is cached, so long-running processes only
+    search once.
     """
-    import os
+    global _resolved_config_path
     
     if config_path:
         return VaultConfig.from_yaml(config_path)
     
+    if _resolved_config_path is None:
+        _resolved_config_path = _find_config_path()
+    return VaultConfig.from_yaml(_resolved_config_path)
+
+
+def _find_config_path() -> Path:
+    """Search the default config locations, in priority order.
+    
+    The path is returned absolute, so the cached result still names the
+    same file after the working directory changes.
+    """
+    import os
+    
     env_path = os.environ.get("VAULT_EMBEDDER_CONFIG")
     if env_path and Path(env_path).exists():
-        return VaultConfig.from_yaml(env_path)
+        return Path(env_path).expanduser().resolve()
     
     local_config = Path("./config.yaml")
     if local_config.exists():
-        return VaultConfig.from_yaml(local_config)
+        return local_config.resolve()
     
     user_config = Path.home() / ".config" / "vault-embedder" / "config.yaml"
     if user_config.exists():
-        return VaultConfig.from_yaml(user_config)
+        return user_config
     
     raise FileNotFoundError(
         "No configuration found. Create config.yaml or set VAULT_EMBEDDER_CONFIG"
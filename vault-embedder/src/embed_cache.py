@@ -0,0 +1,99 @@
+"""Persistent cache of chunk embeddings."""
+
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Optional
+import numpy as np
+
+
+# SQLite limits the number of bound parameters per statement
+LOOKUP_BATCH = 500
+
+
+class EmbedCache:
+    """Embeddings stored in SQLite, keyed on model and chunk text.
+    
+    Embeddings are deterministic for a given model and text, so unchanged
+    chunks never need to be embedded twice, even on a forced reindex.
+    Vectors are stored as float32 bytes.
+    """
+    
+    def __init__(self, path: Path, model_key: str):
+        """Open or create the cache.
+        
+        Args:
+            path: SQLite database file
+            model_key: Identifies the model (and backend) the vectors come from
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.model_key = model_key
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL,"
+            " key BLOB NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " PRIMARY KEY (model, key)"
+            ") WITHOUT ROWID"
+        )
+        self._conn.commit()
+    
+    @staticmethod
+    def _key(text: str) -> bytes:
+        return hashlib.sha256(text.encode()).digest()
+    
+    def get_many(self, texts: list[str]) -> list[Optional[np.ndarray]]:
+        """Look up cached embeddings.
+        
+        Args:
+            texts: Chunk texts
+            
+        Returns:
+            One float32 vector per text, or None where the text isn't cached
+        """
+        keys = [self._key(t) for t in texts]
+        found: dict[bytes, bytes] = {}
+        
+        with self._lock:
+            for start in range(0, len(keys), LOOKUP_BATCH):
+                batch = keys[start:start + LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE model = ? AND key IN ({placeholders})",
+                    [self.model_key, *batch],
+                )
+                found.update(rows)
+        
+        return [
+            np.frombuffer(found[k], dtype=np.float32) if k in found else None
+            for k in keys
+        ]
+    
+    def put_many(self, texts: list[str], embeddings: np.ndarray):
+        """Store embeddings, one row per text.
+        
+        Args:
+            texts: Chunk texts
+            embeddings: Matrix of shape (len(texts), dimensions)
+        """
+        vectors = np.ascontiguousarray(embeddings, dtype=np.float32)
+        rows = [
+            (self.model_key, self._key(t), v.tobytes())
+            for t, v in zip(texts, vectors)
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, key, vector) VALUES (?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+    
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
@@ -1,47 +1,215 @@
 """Embedding model wrapper using sentence-transformers."""
 
-from typing import Optional
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Optional
 import numpy as np
+
+# Keep MKL from shrinking its thread pool per call; must be set before torch loads
+os.environ.setdefault("MKL_DYNAMIC", "FALSE")
+
+import torch
 from sentence_transformers import SentenceTransformer
 
 
+BACKENDS = ("st", "onnx")
+
+# The indexer encodes texts this many batches at a time, so sorting by
+# length inside one encode call can group similar-length texts together
+ENCODE_WINDOW_BATCHES = 16
+
+
 class Embedder:
-    """Wrapper for bge-micro-v2 embedding model."""
+    """Wrapper for bge-micro-v2 embedding model.
+    
+    Two backends produce the same normalized embeddings:
+    - "st": sentence-transformers on PyTorch (CPU, CUDA or MPS)
+    - "onnx": ONNX Runtime on CPU with an int8 dynamically-quantized export,
+      built once and cached. Needs the 'onnx' extra installed.
+    """
     
     def __init__(
         self,
         model_name: str = "taylorai/bge-micro-v2",
         device: Optional[str] = None,
         cache_dir: Optional[str] = None,
+        backend: str = "st",
     ):
         """Initialize the embedder.
         
         Args:
             model_name: HuggingFace model name or path
             device: Device to use ('cpu', 'cuda', 'mps'). Auto-detected if None.
+                Ignored by the onnx backend, which always runs on CPU.
             cache_dir: Directory to cache the model
+            backend: "st" (sentence-transformers) or "onnx" (int8 ONNX Runtime)
         """
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown embedding backend '{backend}', expected one of {BACKENDS}")
         self.model_name = model_name
+        self.backend = backend
         self._model: Optional[SentenceTransformer] = None
+        self._onnx: Optional[dict[str, Any]] = None
         self._device = device
         self._cache_dir = cache_dir
+        self._load_lock = threading.Lock()
     
     @property
     def model(self) -> SentenceTransformer:
         """Lazy-load the model on first use."""
         if self._model is None:
-            self._model = SentenceTransformer(
-                self.model_name,
-                device=self._device,
-                cache_folder=self._cache_dir,
-            )
+            with self._load_lock:
+                if self._model is None:
+                    self._model = self._load_model()
         return self._model
     
+    def _load_model(self) -> SentenceTransformer:
+        """Load the sentence-transformers model, set up for inference."""
+        model = SentenceTransformer(
+            self.model_name,
+            device=self._device,
+            cache_folder=self._cache_dir,
+        )
+        # Inference only: no dropout, no autograd bookkeeping
+        model.eval()
+        for param in model.parameters():
+            param.requires_grad_(False)
+        
+        if model.device.type == "cpu":
+            torch.set_num_threads(os.cpu_count() or 1)
+        elif model.device.type == "cuda":
+            torch.backends.cuda.matmul.allow_tf32 = True
+            torch.backends.cudnn.benchmark = True
+        
+        return model
+    
+    @property
+    def onnx(self) -> dict[str, Any]:
+        """Lazy-load the quantized ONNX session and tokenizer on first use."""
+        if self._onnx is None:
+            with self._load_lock:
+                if self._onnx is None:
+                    self._onnx = self._load_onnx()
+        return self._onnx
+    
+    def load(self):
+        """Load the active backend's model now rather than on first use.
+        
+        Safe to call from a background thread: loading is guarded by a
+        lock, so concurrent callers wait for the one load.
+        """
+        if self.backend == "onnx":
+            self.onnx
+        else:
+            self.model
+    
+    def _load_onnx(self) -> dict[str, Any]:
+        """Export and quantize the model if not cached, then open a session."""
+        try:
+            import onnxruntime as ort
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            from optimum.onnxruntime import ORTModelForFeatureExtraction
+            from transformers import AutoTokenizer
+        except ImportError as e:
+            raise ImportError(
+                "The onnx embedding backend needs extra packages: "
+                "pip install 'vault-embedder[onnx]'"
+            ) from e
+        
+        cache_root = Path(self._cache_dir) if self._cache_dir else Path.home() / ".cache" / "vault-embedder"
+        export_dir = cache_root / "onnx" / self.model_name.replace("/", "__")
+        quantized_path = export_dir / "model_int8.onnx"
+        
+        if not quantized_path.exists():
+            export_dir.mkdir(parents=True, exist_ok=True)
+            ORTModelForFeatureExtraction.from_pretrained(self.model_name, export=True).save_pretrained(export_dir)
+            AutoTokenizer.from_pretrained(self.model_name).save_pretrained(export_dir)
+            quantize_dynamic(export_dir / "model.onnx", quantized_path, weight_type=QuantType.QInt8)
+        
+        session = ort.InferenceSession(str(quantized_path), providers=["CPUExecutionProvider"])
+        tokenizer = AutoTokenizer.from_pretrained(export_dir)
+        return {
+            "session": session,
+            "tokenizer": tokenizer,
+            "input_names": {i.name for i in session.get_inputs()},
+            "max_length": min(tokenizer.model_max_length, 512),
+            "cls_pooling": self._uses_cls_pooling(),
+        }
+    
+    def _uses_cls_pooling(self) -> bool:
+        """Read the pooling mode from the sentence-transformers config.
+        
+        Falls back to mean pooling when the model has no pooling config.
+        """
+        try:
+            from huggingface_hub import hf_hub_download
+            
+            path = Path(self.model_name) / "1_Pooling" / "config.json"
+            if not path.exists():
+                path = hf_hub_download(self.model_name, "1_Pooling/config.json", cache_dir=self._cache_dir)
+            with open(path) as f:
+                return bool(json.load(f).get("pooling_mode_cls_token"))
+        except Exception:
+            return False
+    
     @property
     def dimensions(self) -> int:
         """Get embedding dimensions."""
+        if self.backend == "onnx":
+            return self.onnx["session"].get_outputs()[0].shape[-1]
         return self.model.get_sentence_embedding_dimension()
     
+    def _encode(self, texts: list[str], batch_size: int, show_progress: bool = False) -> np.ndarray:
+        """Encode texts into a normalized float32 matrix with the active backend."""
+        if self.backend == "onnx":
+            return self._encode_onnx(texts, batch_size)
+        
+        with torch.inference_mode():
+            return self.model.encode(
+                texts,
+                batch_size=batch_size,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                show_progress_bar=show_progress,
+            )
+    
+    def _encode_onnx(self, texts: list[str], batch_size: int) -> np.ndarray:
+        """Run the quantized ONNX model, pool and L2-normalize.
+        
+        Texts are batched in length order so each batch pads to a similar
+        length, then rows are put back in input order.
+        """
+        onnx = self.onnx
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        pooled = []
+        for start in range(0, len(texts), batch_size):
+            encoded = onnx["tokenizer"](
+                [texts[i] for i in order[start:start + batch_size]],
+                padding=True,
+                truncation=True,
+                max_length=onnx["max_length"],
+                return_tensors="np",
+            )
+            feeds = {k: v.astype(np.int64) for k, v in encoded.items() if k in onnx["input_names"]}
+            hidden = onnx["session"].run(None, feeds)[0]
+            
+            if onnx["cls_pooling"]:
+                pooled.append(hidden[:, 0])
+            else:
+                mask = encoded["attention_mask"][..., None].astype(hidden.dtype)
+                pooled.append((hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9))
+        
+        if not pooled:
+            return np.empty((0, self.dimensions), dtype=np.float32)
+        sorted_embeddings = np.concatenate(pooled).astype(np.float32, copy=False)
+        sorted_embeddings /= np.maximum(np.linalg.norm(sorted_embeddings, axis=1, keepdims=True), 1e-12)
+        
+        embeddings = np.empty_like(sorted_embeddings)
+        embeddings[order] = sorted_embeddings
+        return embeddings
+    
     def embed(self, text: str) -> np.ndarray:
         """Embed a single text string.
         
@@ -51,41 +219,48 @@ class Embedder:
         Returns:
             Embedding vector as numpy array
         """
-        return self.model.encode(text, convert_to_numpy=True, normalize_embeddings=True)
+        return self._encode([text], batch_size=1)[0]
     
-    def embed_batch(self, texts: list[str], batch_size: int = 32) -> list[np.ndarray]:
+    def embed_batch(
+        self,
+        texts: list[str],
+        batch_size: int = 32,
+        dtype: np.dtype = np.float16,
+        show_progress: bool = False,
+    ) -> np.ndarray:
         """Embed multiple texts in batches.
         
+        Embeddings are L2-normalized, so every component lies in [-1, 1]
+        and float16 keeps ample precision for cosine ranking at half the
+        size of float32.
+        
         Args:
             texts: List of texts to embed
             batch_size: Batch size for processing
+            dtype: Output dtype of the embedding matrix
+            show_progress: Show the backend's progress bar on stderr; off
+                for the indexer, which has its own progress display
             
         Returns:
-            List of embedding vectors
+            Embedding matrix of shape (len(texts), dimensions), one row per text
         """
-        embeddings = self.model.encode(
-            texts,
-            batch_size=batch_size,
-            convert_to_numpy=True,
-            normalize_embeddings=True,
-            show_progress_bar=len(texts) > batch_size,
-        )
-        return list(embeddings)
+        return self._encode(texts, batch_size, show_progress).astype(dtype, copy=False)
     
     def unload(self):
         """Unload model from memory."""
         if self._model is not None:
             del self._model
             self._model = None
+        self._onnx = None
 
 
 # Singleton instance for CLI use
 _embedder: Optional[Embedder] = None
 
 
-def get_embedder(model_name: str = "taylorai/bge-micro-v2") -> Embedder:
+def get_embedder(model_name: str = "taylorai/bge-micro-v2", backend: str = "st") -> Embedder:
     """Get or create the singleton embedder instance."""
     global _embedder
-    if _embedder is None or _embedder.model_name != model_name:
-        _embedder = Embedder(model_name)
+    if _embedder is None or _embedder.model_name != model_name or _embedder.backend != backend:
+        _embedder = Embedder(model_name, backend=backend)
     return _embedder
@@ -1,23 +1,46 @@
 """Main indexer that orchestrates embedding and storage."""
 
+import asyncio
+import multiprocessing
+import os
+import queue
+import threading
 import uuid
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
 from dataclasses import dataclass
-from pathlib import Path
-from typing import Optional, Callable
-from qdrant_client import QdrantClient
+from itertools import count, islice
+from typing import Iterable, Iterator, Optional, Callable
+import numpy as np
+from qdrant_client import AsyncQdrantClient, QdrantClient
 from qdrant_client.models import (
+    Datatype,
     Distance,
+    OptimizersConfigDiff,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
     VectorParams,
     PointStruct,
     Filter,
+    FilterSelector,
     FieldCondition,
+    MatchAny,
     MatchValue,
+    PointIdsList,
 )
 
 from .config import VaultConfig
-from .embedder import Embedder, get_embedder
-from .chunker import MarkdownChunker, Chunk
-from .walker import VaultWalker, IndexState, FileInfo
+from .embed_cache import EmbedCache
+from .embedder import ENCODE_WINDOW_BATCHES, Embedder, get_embedder
+from .chunker import MarkdownChunker, Chunk, chunk_file
+from .walker import VaultWalker, IndexState, FileInfo, hash_all
 
 
 @dataclass
@@ -36,6 +59,102 @@ class IndexResult:
             self.errors = []
 
 
+@dataclass
+class _PendingFile:
+    """An embedded file waiting in the store stage's upsert batch."""
+    
+    file_info: FileInfo
+    chunks: list[Chunk]
+    embeddings: Optional[np.ndarray]
+    chunk_ids: list[str]
+    stale_ids: list[str]         # Old chunk IDs to delete from Qdrant
+
+
+# Chunk IDs are uuid5 of path, chunk index and content hash, so reindexing
+# unchanged content upserts the same points instead of replacing them
+CHUNK_ID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "vault-embedder/chunk")
+
+# Points are built from values we produced ourselves, so pydantic
+# validation is skipped (model_construct on pydantic 2, construct on 1)
+_construct_point = (
+    PointStruct.model_construct if hasattr(PointStruct, "model_construct") else PointStruct.construct
+)
+
+# Runs over at least this many files defer HNSW indexing until the end
+BULK_INDEX_MIN_FILES = 100
+
+# Files a pipeline stage may run ahead of the next one
+STAGE_QUEUE_SIZE = 32
+
+# Seconds a stage waits on a full queue before checking whether its
+# consumer has stopped
+STAGE_PUT_TIMEOUT = 0.1
+
+_STAGE_DONE = object()
+
+
+def _run_stage(items: Iterable, maxsize: int = STAGE_QUEUE_SIZE) -> Iterator:
+    """Drive an iterator on a background thread, as one pipeline stage.
+    
+    Items are handed over through a bounded queue, so the stage runs at
+    most maxsize items ahead of its consumer. An exception raised by the
+    stage is re-raised in the consumer.
+    
+    If the consumer stops early (it raised, or closed this generator),
+    the stage stops too and closes items on its own thread, so pools
+    upstream shut down instead of waiting forever on a full queue.
+    """
+    handoff: queue.Queue = queue.Queue(maxsize)
+    stop = threading.Event()
+    
+    def put(entry) -> bool:
+        while not stop.is_set():
+            try:
+                handoff.put(entry, timeout=STAGE_PUT_TIMEOUT)
+                return True
+            except queue.Full:
+                pass
+        return False
+    
+    def produce():
+        try:
+            for item in items:
+                if not put((item, None)):
+                    return
+        except BaseException as e:
+            put((_STAGE_DONE, e))
+        else:
+            put((_STAGE_DONE, None))
+        finally:
+            close = getattr(items, "close", None)
+            if close is not None:
+                close()
+    
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            item, error = handoff.get()
+            if item is _STAGE_DONE:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+
+
+def _chunk_mp_context() -> multiprocessing.context.BaseContext:
+    """Start method for chunk worker processes.
+    
+    Forking would copy this process's heap (model included) and its
+    running stage threads into every worker; forkserver and spawn start
+    clean interpreters that import only the chunker.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
 class VaultIndexer:
     """Indexes vault content into Qdrant."""
     
@@ -49,24 +168,35 @@ class VaultIndexer:
         self._embedder: Optional[Embedder] = None
         self._client: Optional[QdrantClient] = None
         self._chunker: Optional[MarkdownChunker] = None
+        self._embed_cache: Optional[EmbedCache] = None
+        self._warm_thread: Optional[threading.Thread] = None
+        self._warm_error: Optional[Exception] = None
         self._walker: Optional[VaultWalker] = None
         self._state: Optional[IndexState] = None
+        self._collection_ensured: bool = False
     
     @property
     def embedder(self) -> Embedder:
         """Lazy-load embedder."""
         if self._embedder is None:
-            self._embedder = get_embedder(self.config.model_name)
+            self._embedder = get_embedder(self.config.model_name, self.config.embedding_backend)
         return self._embedder
     
+    @property
+    def embed_cache(self) -> Optional[EmbedCache]:
+        """Lazy-load the embedding cache; None when disabled."""
+        if self._embed_cache is None and self.config.embed_cache:
+            self._embed_cache = EmbedCache(
+                self.config.embed_cache_path,
+                f"{self.config.model_name}:{self.config.embedding_backend}",
+            )
+        return self._embed_cache
+    
     @property
     def client(self) -> QdrantClient:
         """Lazy-load Qdrant client."""
         if self._client is None:
-            self._client = QdrantClient(
-                url=self.config.qdrant_url,
-                api_key=self.config.qdrant_api_key,
-            )
+            self._client = QdrantClient(**self.config.qdrant_client_kwargs())
         return self._client
     
     @property
@@ -88,6 +218,7 @@ class VaultIndexer:
                 vault_path=self.config.vault,
                 include_extensions=self.config.include_extensions,
                 exclude_patterns=self.config.exclude_patterns,
+                max_file_bytes=self.config.max_file_bytes,
             )
         return self._walker
     
@@ -100,18 +231,62 @@ class VaultIndexer:
             self._state.model_name = self.config.model_name
         return self._state
     
-    def ensure_collection(self):
-        """Ensure the Qdrant collection exists with correct config."""
-        collections = [c.name for c in self.client.get_collections().collections]
+    @property
+    def _vector_dtype(self) -> np.dtype:
+        """Dtype that embeddings are sent to Qdrant in."""
+        return np.float16 if self.config.quantization == "fp16" else np.float32
+    
+    def ensure_collection(self, bulk: bool = False) -> bool:
+        """Ensure the Qdrant collection exists with correct config.
         
-        if self.config.collection_name not in collections:
+        Args:
+            bulk: Create the collection with HNSW indexing deferred, for a
+                bulk load that restores indexing_threshold afterwards
+            
+        Returns:
+            True if this call created the collection
+        """
+        # Checked once per indexer; clear() resets this when it drops the collection
+        if self._collection_ensured:
+            return False
+        
+        created = not self.client.collection_exists(self.config.collection_name)
+        if created:
+            # int8 keeps a quantized copy in RAM for search; originals are
+            # used for rescoring
+            quantization_config = None
+            if self.config.quantization == "int8":
+                quantization_config = ScalarQuantization(
+                    scalar=ScalarQuantizationConfig(type=ScalarType.INT8, always_ram=True),
+                )
+            
             self.client.create_collection(
                 collection_name=self.config.collection_name,
                 vectors_config=VectorParams(
                     size=self.config.model_dimensions,
                     distance=Distance.COSINE,
+                    datatype=Datatype.FLOAT16 if self.config.quantization == "fp16" else None,
+                ),
+                optimizers_config=OptimizersConfigDiff(
+                    indexing_threshold=0 if bulk else self.config.indexing_threshold,
                 ),
+                quantization_config=quantization_config,
             )
+        
+        self._collection_ensured = True
+        return created
+    
+    def _get_indexing_threshold(self) -> Optional[int]:
+        """The collection's current HNSW indexing threshold, None if unset."""
+        info = self.client.get_collection(self.config.collection_name)
+        return info.config.optimizer_config.indexing_threshold
+    
+    def _set_indexing_threshold(self, threshold: int):
+        """Set the collection's HNSW indexing threshold; 0 defers indexing."""
+        self.client.update_collection(
+            collection_name=self.config.collection_name,
+            optimizers_config=OptimizersConfigDiff(indexing_threshold=threshold),
+        )
     
     def index(
         self,
@@ -124,16 +299,16 @@ class VaultIndexer:
         Args:
             files: Specific files to index (relative paths). If None, index all.
             force: Force reindex even if unchanged
-            progress_callback: Optional callback(file_path, current, total)
+            progress_callback: Optional callback(file_path, current, total).
+                Calls are never concurrent; they come from the calling thread,
+                or from one worker thread if an event loop is already running
+                on it.
             
         Returns:
             IndexResult with statistics
         """
         result = IndexResult()
         
-        # Ensure collection exists
-        self.ensure_collection()
-        
         # Get files to process
         if files:
             file_infos = [
@@ -149,106 +324,590 @@ class VaultIndexer:
         else:
             file_infos = list(self.walker.walk())
         
+        # Files that stop being indexed (grown past max_file_bytes, turned
+        # binary) lose any chunks they had, as if deleted. The walk leaves
+        # out oversized files, so that case only arises for named files
+        dropped: list[str] = []
+        if files and self.config.max_file_bytes:
+            dropped = [fi.relative_path for fi in file_infos if fi.size > self.config.max_file_bytes]
+            file_infos = [fi for fi in file_infos if fi.size <= self.config.max_file_bytes]
+        
         total_files = len(file_infos)
+        done = count(1)
         
-        # Process each file
-        for i, file_info in enumerate(file_infos):
+        def report(file_info: FileInfo):
             if progress_callback:
-                progress_callback(file_info.relative_path, i + 1, total_files)
-            
-            try:
-                # Compute content hash
-                file_info.compute_hash()
-                
-                # Check if needs reindex
-                if not force and not self.state.needs_reindex(file_info):
-                    result.files_skipped += 1
-                    continue
-                
-                # Remove old chunks if file was previously indexed
-                old_chunk_ids = self.state.remove_file(file_info.relative_path)
-                if old_chunk_ids:
-                    self._delete_chunks(old_chunk_ids)
-                    result.chunks_removed += len(old_chunk_ids)
-                
-                # Index file
-                chunk_ids = self._index_file(file_info)
-                
-                # Update state
-                self.state.update_file(file_info, chunk_ids)
-                
-                result.files_processed += 1
-                result.chunks_added += len(chunk_ids)
-                
-            except Exception as e:
-                result.errors.append(f"{file_info.relative_path}: {str(e)}")
+                progress_callback(file_info.relative_path, next(done), total_files)
+        
+        to_hash = self._stat_changed(file_infos, self.state, force, result, report)
+        
+        # Building HNSW while points stream in slows a large load; defer
+        # it and build the graph once at the end. Files that pass the
+        # stat check are never reindexed, so only the rest count
+        bulk = len(to_hash) >= BULK_INDEX_MIN_FILES
+        
+        # Ensure collection exists; one created for a bulk load already
+        # defers indexing
+        created = self.ensure_collection(bulk=bulk)
+        restore_threshold = None
+        if created:
+            if bulk:
+                restore_threshold = self.config.indexing_threshold
+        else:
+            # Only bulk loads set 0, so finding it means one was killed
+            # before restoring indexing, or another is still running.
+            # Restoring it as found would leave HNSW off for good, so 0
+            # counts as unset and is repaired
+            current = self._get_indexing_threshold()
+            if bulk:
+                restore_threshold = current or self.config.indexing_threshold
+                self._set_indexing_threshold(0)
+            elif current == 0:
+                self._set_indexing_threshold(self.config.indexing_threshold)
+        try:
+            self._run_pipeline(to_hash, force, result, report, dropped)
+        finally:
+            self.close()
+            if restore_threshold is not None:
+                self._set_indexing_threshold(restore_threshold)
         
         # Handle deleted files
+        indexed = self.state.paths()
+        deleted = [rel_path for rel_path in dropped if rel_path in indexed]
         if not files:  # Only check for deletions on full reindex
-            deleted = self.walker.find_deleted(self.state)
-            for rel_path in deleted:
-                chunk_ids = self.state.remove_file(rel_path)
-                if chunk_ids:
-                    self._delete_chunks(chunk_ids)
-                    result.chunks_removed += len(chunk_ids)
-                result.files_deleted += 1
+            live_paths = {file_info.relative_path for file_info in file_infos}
+            deleted += self.walker.find_deleted(self.state, live_paths)
+        for rel_path in deleted:
+            result.chunks_removed += len(self.state.remove_file(rel_path))
+            result.files_deleted += 1
+        self._delete_paths(deleted)
         
         # Save state
         self.state.save(self.config.state_path)
         
         return result
     
-    def _index_file(self, file_info: FileInfo) -> list[str]:
-        """Index a single file.
+    def close(self):
+        """Close the embedding cache, if one is open.
+        
+        index() calls this when it finishes; the cache is reopened if
+        the indexer is used again.
+        """
+        if self._embed_cache is not None:
+            self._embed_cache.close()
+            self._embed_cache = None
+    
+    def _run_pipeline(
+        self,
+        to_hash: list[FileInfo],
+        force: bool,
+        result: IndexResult,
+        report: Callable[[FileInfo], None],
+        dropped: list[str],
+    ):
+        """Hash, chunk, embed and store files, recording outcomes in result.
         
         Args:
-            file_info: File information
+            to_hash: Files that failed the stat check against state
+            force: Reindex files even if their content is unchanged
+            result: Result to record outcomes in
+            report: Called once per file as it finishes
+            dropped: Paths of files skipped as binary are appended here
+        """
+        # Only files that failed the stat check can need chunking, so a
+        # small change doesn't start a worker per CPU. Files chunked in
+        # this process reuse the bytes read for hashing; worker processes
+        # read from the page cache, cheaper than sending them the content
+        chunk_workers = min(self.config.chunk_workers or os.cpu_count() or 1, len(to_hash))
+        in_process = chunk_workers <= 1 or self.config.chunk_executor == "thread"
+        
+        pipeline = self._run_stages(to_hash, force, result, report, dropped, chunk_workers, in_process)
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            asyncio.run(pipeline)
+        else:
+            # asyncio.run() can't be nested in a running loop, as in a
+            # notebook or an async app; give this run a thread of its own
+            with ThreadPoolExecutor(max_workers=1) as pool:
+                pool.submit(asyncio.run, pipeline).result()
+    
+    async def _run_stages(
+        self,
+        to_hash: list[FileInfo],
+        force: bool,
+        result: IndexResult,
+        report: Callable[[FileInfo], None],
+        dropped: list[str],
+        chunk_workers: int,
+        in_process: bool,
+    ):
+        """Run the pipeline stages, storing their output on this event loop.
+        
+        Hashing, chunking and embedding each run on their own thread, a
+        bounded queue ahead of the next stage; the loop stores the results,
+        with a few upserts in flight at once. Files finished by the hashing
+        stage are reported through the loop, so report is only ever called
+        from its thread.
+        """
+        loop = asyncio.get_running_loop()
+        report_errors: list[Exception] = []
+        
+        def report_on_loop(file_info: FileInfo):
+            try:
+                report(file_info)
+            except Exception as e:
+                report_errors.append(e)
+        
+        def report_from_stage(file_info: FileInfo):
+            loop.call_soon_threadsafe(report_on_loop, file_info)
+        
+        pending = _run_stage(
+            self._changed_files(to_hash, self.state, force, result, report_from_stage, dropped, in_process)
+        )
+        chunked = _run_stage(self._chunk_files(pending, chunk_workers))
+        embedded = _run_stage(self._embed_files(chunked))
+        try:
+            await self._store_files(embedded, result, report)
+        finally:
+            # Stops the stages if storing ended early; each closes the one
+            # before it in turn. A next() still running on a worker thread
+            # (cancelled mid-wait) leaves this to garbage collection
+            if not embedded.gi_running:
+                embedded.close()
+        
+        # A stage's reports are queued on the loop before its end reaches
+        # the store, so all have run by now
+        if report_errors:
+            raise report_errors[0]
+    
+    @staticmethod
+    def _stat_changed(
+        file_infos: list[FileInfo],
+        state: IndexState,
+        force: bool,
+        result: IndexResult,
+        report: Callable[[FileInfo], None],
+    ) -> list[FileInfo]:
+        """Files whose mtime or size differ from state, so must be hashed.
+        
+        Files with the mtime and size they were indexed with are taken as
+        unchanged without being read, unless force is set; they are
+        recorded in result and reported here.
+        """
+        to_hash = []
+        for file_info in file_infos:
+            if not force and state.stat_unchanged(file_info):
+                result.files_skipped += 1
+                report(file_info)
+            else:
+                to_hash.append(file_info)
+        return to_hash
+    
+    def _changed_files(
+        self,
+        file_infos: list[FileInfo],
+        state: IndexState,
+        force: bool,
+        result: IndexResult,
+        report: Callable[[FileInfo], None],
+        dropped: list[str],
+        load: bool = False,
+    ) -> Iterator[FileInfo]:
+        """Hash files on a thread pool and yield those that need reindexing.
+        
+        With load, yielded files keep the content read for hashing in raw;
+        it is dropped from the others.
+        
+        Unchanged, binary and unreadable files are recorded in result and reported
+        here, since they go no further down the pipeline; binary files are
+        also added to dropped. state is passed in so it is loaded on the
+        calling thread, not on this stage's.
+        """
+        for file_info, error in hash_all(file_infos, self.config.load_workers or None, load):
+            if error is not None:
+                result.errors.append(f"{file_info.relative_path}: {error}")
+            elif self.config.skip_binary and file_info.binary:
+                # Misnamed binary; sniffed while hashing, at no extra read
+                dropped.append(file_info.relative_path)
+                result.files_skipped += 1
+            elif force or state.needs_reindex(file_info):
+                self._warm_embedder()
+                yield file_info
+                continue
+            else:
+                # Touched but unchanged; refresh its stat so the next run
+                # skips it without hashing
+                state.refresh_stat(file_info)
+                result.files_skipped += 1
+            file_info.raw = None
+            report(file_info)
+    
+    def _warm_embedder(self):
+        """Start loading the embedding model in the background, once.
+        
+        Called when the first file needing reindexing is found, so the
+        model loads while files are still being hashed and chunked, and
+        runs with nothing to embed never load it.
+        """
+        if self._warm_thread is None:
+            self._warm_thread = threading.Thread(target=self._load_embedder, daemon=True)
+            self._warm_thread.start()
+    
+    def _load_embedder(self):
+        """Load the model on the warm-up thread, keeping any error for later."""
+        try:
+            self.embedder.load()
+        except Exception as e:
+            self._warm_error = e
+    
+    def _wait_for_embedder(self):
+        """Wait for the background model load, re-raising its error.
+        
+        The error ends the run rather than failing each file in turn, and
+        is cleared so a later run tries the load again.
+        """
+        if self._warm_thread is not None:
+            self._warm_thread.join()
+        if self._warm_error is not None:
+            error, self._warm_error = self._warm_error, None
+            self._warm_thread = None
+            raise error
+    
+    def _chunk_files(
+        self,
+        file_infos: Iterable[FileInfo],
+        workers: int,
+    ) -> Iterator[tuple[FileInfo, list[Chunk], Optional[str]]]:
+        """Chunk files on a pool of parallel workers when there are several.
+        
+        Chunking is CPU-bound and independent per file, so worker processes
+        scale it with cores; chunk_executor "thread" avoids starting
+        processes, which suits small incremental runs. At most two files
+        per worker are in flight, and results are yielded as they finish,
+        so one large file doesn't hold back the others.
+        
+        Args:
+            file_infos: Files to chunk
+            workers: Size of the pool; files are chunked here if at most 1
             
+        Yields:
+            (file_info, chunks, error) per file, in completion order
+        """
+        chunker = self.chunker
+        
+        if workers <= 1:
+            for file_info in file_infos:
+                chunks, error = chunk_file(file_info.path, chunker, self._loaded_text(file_info))
+                file_info.raw = None
+                yield file_info, chunks, error
+            return
+        
+        if self.config.chunk_executor == "thread":
+            pool = ThreadPoolExecutor(max_workers=workers)
+        else:
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=_chunk_mp_context())
+        with pool:
+            in_flight: dict[Future, FileInfo] = {}
+            for file_info in file_infos:
+                future = pool.submit(chunk_file, file_info.path, chunker, self._loaded_text(file_info))
+                in_flight[future] = file_info
+                if len(in_flight) >= 2 * workers:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield self._chunked(in_flight.pop(future), future)
+            for future in as_completed(in_flight):
+                yield self._chunked(in_flight[future], future)
+    
+    @staticmethod
+    def _loaded_text(file_info: FileInfo) -> Optional[str]:
+        """The file's text if its content was loaded while hashing, else None."""
+        return file_info.text() if file_info.raw is not None else None
+    
+    @staticmethod
+    def _chunked(
+        file_info: FileInfo,
+        future: Future,
+    ) -> tuple[FileInfo, list[Chunk], Optional[str]]:
+        """Collect a finished chunking job, releasing the file's content."""
+        file_info.raw = None
+        return (file_info, *future.result())
+    
+    def _embed_files(
+        self,
+        chunked: Iterable[tuple[FileInfo, list[Chunk], Optional[str]]],
+    ) -> Iterator[tuple[FileInfo, list[Chunk], Optional[np.ndarray], Optional[str]]]:
+        """Embed chunks across files, a window of embed_batch_size batches per call.
+        
+        Most notes yield only a few chunks, so chunks of consecutive files
+        are gathered into one embed call rather than one call per file.
+        Each call covers ENCODE_WINDOW_BATCHES batches, so the backend's
+        length sort has enough texts to keep padding low.
+        
+        Yields:
+            (file_info, chunks, embeddings, error) per file, in input order;
+            embeddings is None for files with no chunks or an error
+        """
+        window_size = self.config.embed_batch_size * ENCODE_WINDOW_BATCHES
+        group: list[tuple[FileInfo, list[Chunk], Optional[str]]] = []
+        texts: list[str] = []
+        
+        for file_info, chunks, error in chunked:
+            group.append((file_info, chunks, error))
+            if error is None:
+                texts.extend(c.text for c in chunks)
+            if len(texts) >= window_size:
+                yield from self._embed_group(group, texts)
+                group, texts = [], []
+        
+        if group:
+            yield from self._embed_group(group, texts)
+    
+    def _embed_group(
+        self,
+        group: list[tuple[FileInfo, list[Chunk], Optional[str]]],
+        texts: list[str],
+    ) -> Iterator[tuple[FileInfo, list[Chunk], Optional[np.ndarray], Optional[str]]]:
+        """Embed the texts of a group of files and split the rows per file."""
+        embeddings = None
+        embed_error = None
+        if texts:
+            self._wait_for_embedder()
+            try:
+                embeddings = self._embed_texts(texts)
+            except Exception as e:
+                embed_error = str(e)
+        
+        offset = 0
+        for file_info, chunks, error in group:
+            if error is not None or not chunks:
+                yield file_info, chunks, None, error
+            elif embed_error is not None:
+                yield file_info, chunks, None, embed_error
+            else:
+                yield file_info, chunks, embeddings[offset:offset + len(chunks)], None
+                offset += len(chunks)
+    
+    def _embed_texts(self, texts: list[str]) -> np.ndarray:
+        """Embed texts, reusing cached embeddings of texts seen before.
+        
+        Only texts missing from the cache reach the model, so a forced
+        reindex of unchanged notes costs lookups rather than inference.
+        Templated notes repeat chunks verbatim, so each distinct text is
+        looked up and embedded once and its row copied to every duplicate.
+        
         Returns:
-            List of chunk IDs that were created
+            Embedding matrix in the dtype vectors are sent to Qdrant in
         """
-        # Read content
-        content = file_info.path.read_text(encoding='utf-8', errors='replace')
+        slots: dict[str, int] = {}
+        back = [slots.setdefault(t, len(slots)) for t in texts]
+        unique = list(slots)
+        
+        embeddings = self._embed_unique(unique)
+        if len(unique) < len(texts):
+            embeddings = embeddings[back]
+        return embeddings
+    
+    def _embed_unique(self, texts: list[str]) -> np.ndarray:
+        """Embed distinct texts through the embed cache, if enabled."""
+        cache = self.embed_cache
+        if cache is None:
+            return self.embedder.embed_batch(
+                texts,
+                batch_size=self.config.embed_batch_size,
+                dtype=self._vector_dtype,
+            )
         
-        # Chunk content
-        chunks = list(self.chunker.chunk(content))
+        rows = cache.get_many(texts)
+        missing = [i for i, row in enumerate(rows) if row is None]
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            new = self.embedder.embed_batch(
+                missing_texts,
+                batch_size=self.config.embed_batch_size,
+                dtype=np.float32,
+            )
+            cache.put_many(missing_texts, new)
+            for i, row in zip(missing, new):
+                rows[i] = row
         
-        if not chunks:
-            return []
+        return np.stack(rows).astype(self._vector_dtype, copy=False)
+    
+    async def _store_files(
+        self,
+        embedded: Iterable[tuple[FileInfo, list[Chunk], Optional[np.ndarray], Optional[str]]],
+        result: IndexResult,
+        report: Callable[[FileInfo], None],
+    ):
+        """Store embedded files in batches of about upsert_batch_size points.
+        
+        Points from several files share one upsert request, and up to
+        upload_concurrency requests are in flight at once; upserts are
+        network-bound, so this hides most of the round-trip latency. The
+        async client is created per run, as it is bound to the event loop.
+        """
+        aclient = AsyncQdrantClient(**self.config.qdrant_client_kwargs())
+        semaphore = asyncio.Semaphore(self.config.upload_concurrency)
+        tasks: list[asyncio.Task] = []
+        iterator = iter(embedded)
+        
+        # Files waiting for upsert, and how many points they hold
+        batch_files: list[_PendingFile] = []
+        batch_count = 0
         
-        # Embed all chunks
-        texts = [c.text for c in chunks]
-        embeddings = self.embedder.embed_batch(texts)
+        async def flush():
+            await semaphore.acquire()
+            task = asyncio.create_task(
+                self._flush_upsert(aclient, semaphore, batch_files, result, report)
+            )
+            tasks.append(task)
         
-        # Build points
-        points = []
-        chunk_ids = []
+        try:
+            while True:
+                # The pipeline queue blocks, so wait for it off the event loop
+                item = await asyncio.to_thread(next, iterator, None)
+                if item is None:
+                    break
+                
+                file_info, chunks, embeddings, error = item
+                if error is not None:
+                    result.errors.append(f"{file_info.relative_path}: {error}")
+                    report(file_info)
+                    continue
+                
+                chunk_ids = self._chunk_ids(file_info, chunks)
+                
+                # Points with unchanged IDs are overwritten by the upsert;
+                # only chunks that no longer exist need deleting
+                old_chunk_ids = self.state.remove_file(file_info.relative_path)
+                kept = set(chunk_ids)
+                stale_ids = [i for i in old_chunk_ids if i not in kept]
+                
+                batch_files.append(_PendingFile(file_info, chunks, embeddings, chunk_ids, stale_ids))
+                batch_count += len(chunks)
+                
+                if batch_count >= self.config.upsert_batch_size:
+                    await flush()
+                    batch_files, batch_count = [], 0
+            
+            if batch_files:
+                await flush()
+        finally:
+            # Every upsert finishes before the client closes, and any error
+            # one raised (a failing progress callback, say) is re-raised
+            outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+            await aclient.close()
         
-        for chunk, embedding in zip(chunks, embeddings):
-            chunk_id = str(uuid.uuid4())
-            chunk_ids.append(chunk_id)
+        for outcome in outcomes:
+            if isinstance(outcome, BaseException):
+                raise outcome
+    
+    async def _flush_upsert(
+        self,
+        aclient: AsyncQdrantClient,
+        semaphore: asyncio.Semaphore,
+        files: list[_PendingFile],
+        result: IndexResult,
+        report: Callable[[FileInfo], None],
+    ):
+        """Replace a batch of files' chunks in Qdrant, then update state.
+        
+        Points are built one upsert request at a time, so a large file
+        never has all of its vectors converted to lists at once.
+        State is only updated once all of a file's points are stored.
+        Releases semaphore when done, which the caller acquired for it.
+        """
+        batch_size = self.config.upsert_batch_size
+        try:
+            # Remove chunks that no longer exist in their files
+            stale_ids = [chunk_id for f in files for chunk_id in f.stale_ids]
+            if stale_ids:
+                await aclient.delete(
+                    collection_name=self.config.collection_name,
+                    points_selector=PointIdsList(points=stale_ids),
+                )
+                result.chunks_removed += len(stale_ids)
             
-            points.append(PointStruct(
-                id=chunk_id,
-                vector=embedding.tolist(),
-                payload={
-                    "path": file_info.relative_path,
-                    "text": chunk.text,
-                    "heading": chunk.heading,
-                    "line_start": chunk.line_start,
-                    "line_end": chunk.line_end,
-                    "chunk_index": chunk.chunk_index,
-                    "content_hash": file_info.content_hash,
-                },
-            ))
-        
-        # Upsert to Qdrant
-        self.client.upsert(
-            collection_name=self.config.collection_name,
-            points=points,
-        )
+            # Upsert to Qdrant; one large file may need several requests
+            points = (
+                point
+                for f in files
+                for point in self._iter_points(f.file_info, f.chunks, f.embeddings, f.chunk_ids)
+            )
+            while batch := list(islice(points, batch_size)):
+                await aclient.upsert(
+                    collection_name=self.config.collection_name,
+                    points=batch,
+                )
+            
+            # Update state
+            for f in files:
+                self.state.update_file(f.file_info, f.chunk_ids)
+                result.files_processed += 1
+                result.chunks_added += len(f.chunk_ids)
+                
+        except Exception as e:
+            for f in files:
+                result.errors.append(f"{f.file_info.relative_path}: {str(e)}")
+        finally:
+            semaphore.release()
+            for f in files:
+                report(f.file_info)
+    
+    @staticmethod
+    def _chunk_ids(file_info: FileInfo, chunks: list[Chunk]) -> list[str]:
+        """Deterministic point IDs for a file's chunks, in chunk order."""
+        path = file_info.relative_path
+        content_hash = file_info.content_hash
+        return [
+            str(uuid.uuid5(CHUNK_ID_NAMESPACE, f"{path}:{chunk.chunk_index}:{content_hash:016x}"))
+            for chunk in chunks
+        ]
+    
+    def _iter_points(
+        self,
+        file_info: FileInfo,
+        chunks: list[Chunk],
+        embeddings: Optional[np.ndarray],
+        chunk_ids: list[str],
+    ) -> Iterator[PointStruct]:
+        """Build Qdrant points for a single file's embedded chunks.
+        
+        Args:
+            file_info: File information
+            chunks: Chunks of the file's content
+            embeddings: One embedding row per chunk
+            chunk_ids: Point ID per chunk, as from _chunk_ids
+            
+        Yields:
+            One point per chunk
+        """
+        if not chunks:
+            return
+        
+        path = file_info.relative_path
+        window = self.config.upsert_batch_size
         
-        return chunk_ids
+        # The client serializes vectors as lists. Rows are converted a
+        # window at a time: a list of floats is many times the size of
+        # its float16 row, so converting a whole large file would hold
+        # all of it at once.
+        for start in range(0, len(chunks), window):
+            stop = start + window
+            vectors = embeddings[start:stop].tolist()
+            for chunk, chunk_id, vector in zip(chunks[start:stop], chunk_ids[start:stop], vectors):
+                yield _construct_point(
+                    id=chunk_id,
+                    vector=vector,
+                    payload={
+                        "path": path,
+                        "text": chunk.text,
+                        "heading": chunk.heading,
+                        "line_start": chunk.line_start,
+                        "line_end": chunk.line_end,
+                        "chunk_index": chunk.chunk_index,
+                    },
+                )
     
     def _delete_chunks(self, chunk_ids: list[str]):
         """Delete chunks from Qdrant.
@@ -261,7 +920,28 @@ class VaultIndexer:
         
         self.client.delete(
             collection_name=self.config.collection_name,
-            points_selector=chunk_ids,
+            points_selector=PointIdsList(points=chunk_ids),
+        )
+    
+    def _delete_paths(self, relative_paths: list[str]):
+        """Delete every chunk of the given files from Qdrant in one request.
+        
+        Matches on the path payload, so chunks missing from state are
+        removed too.
+        
+        Args:
+            relative_paths: Relative paths of files to delete
+        """
+        if not relative_paths:
+            return
+        
+        self.client.delete(
+            collection_name=self.config.collection_name,
+            points_selector=FilterSelector(
+                filter=Filter(must=[
+                    FieldCondition(key="path", match=MatchAny(any=relative_paths)),
+                ]),
+            ),
         )
     
     def delete_file(self, relative_path: str) -> int:
@@ -285,6 +965,7 @@ class VaultIndexer:
             self.client.delete_collection(self.config.collection_name)
         except Exception:
             pass  # Collection might not exist
+        self._collection_ensured = False
         
         self._state = IndexState()
         self._state.collection_name = self.config.collection_name
@@ -308,7 +989,7 @@ class VaultIndexer:
             "collection_name": self.config.collection_name,
             "vault_path": str(self.config.vault),
             "model_name": self.config.model_name,
-            "indexed_files": len(self.state.files),
+            "indexed_files": len(self.state),
             "total_chunks": point_count,
             "last_indexed": self.state.last_indexed,
         }
@@ -1,7 +1,9 @@
 """Search functionality for vault embeddings."""
 
 from dataclasses import dataclass
+from functools import lru_cache
 from typing import Optional, Iterable
+import numpy as np
 from qdrant_client import QdrantClient
 from qdrant_client.models import (
     Filter,
@@ -12,6 +14,18 @@ from qdrant_client.models import (
 
 from .config import VaultConfig
 from .embedder import Embedder, get_embedder
+from .walker import IndexState
+
+
+@lru_cache(maxsize=256)
+def _embed_query_cached(model_name: str, backend: str, query: str) -> np.ndarray:
+    """Embed a search query, memoized for repeated queries.
+    
+    The vector is returned read-only, since cached arrays are shared.
+    """
+    vector = get_embedder(model_name, backend).embed(query)
+    vector.setflags(write=False)
+    return vector
 
 
 @dataclass
@@ -53,23 +67,28 @@ class VaultSearcher:
         self.verify_schema = verify_schema
         self._embedder: Optional[Embedder] = None
         self._client: Optional[QdrantClient] = None
+        self._state: Optional[IndexState] = None
         self._schema_verified: bool = False
     
     @property
     def embedder(self) -> Embedder:
         """Lazy-load embedder."""
         if self._embedder is None:
-            self._embedder = get_embedder(self.config.model_name)
+            self._embedder = get_embedder(self.config.model_name, self.config.embedding_backend)
         return self._embedder
     
+    @property
+    def state(self) -> IndexState:
+        """Lazy-load index state, used to look up a file's chunk IDs."""
+        if self._state is None:
+            self._state = IndexState.load(self.config.state_path)
+        return self._state
+    
     @property
     def client(self) -> QdrantClient:
         """Lazy-load Qdrant client."""
         if self._client is None:
-            self._client = QdrantClient(
-                url=self.config.qdrant_url,
-                api_key=self.config.qdrant_api_key,
-            )
+            self._client = QdrantClient(**self.config.qdrant_client_kwargs())
         # Verify schema once on first access
         if self.verify_schema and not self._schema_verified:
             self._verify_collection_schema()
@@ -135,6 +154,11 @@ class VaultSearcher:
             return None
         return Filter(must=must)
     
+    @classmethod
+    def invalidate_query_cache(cls) -> None:
+        """Drop cached query embeddings, e.g. after the model changed."""
+        _embed_query_cached.cache_clear()
+    
     def search(
         self,
         query: str,
@@ -154,8 +178,11 @@ class VaultSearcher:
         Returns:
             List of SearchResult objects
         """
-        # Embed query
-        query_vector = self.embedder.embed(query).tolist()
+        # Embed query; repeated queries are served from the cache. The
+        # client takes the numpy array as is, no list conversion needed
+        query_vector = _embed_query_cached(
+            self.config.model_name, self.config.embedding_backend, query
+        )
         
         # Build filter if needed
         search_filter = None
@@ -199,6 +226,7 @@ class VaultSearcher:
         limit: int = 10,
         min_score: float = 0.0,
         exclude_same_file: bool = True,
+        average: bool = False,
     ) -> list[SearchResult]:
         """Find content similar to a specific file.
         
@@ -207,31 +235,47 @@ class VaultSearcher:
             limit: Maximum number of results
             min_score: Minimum similarity score
             exclude_same_file: Exclude results from the same file
+            average: Search with the mean of all the file's chunk vectors
+                instead of its first chunk's
             
         Returns:
             List of SearchResult objects
         """
-        # Get vectors for the source file
-        source_points = self.client.scroll(
-            collection_name=self.config.collection_name,
-            scroll_filter=Filter(
-                must=[
-                    FieldCondition(
-                        key="path",
-                        match=MatchValue(value=source_path),
-                    )
-                ]
-            ),
-            with_vectors=True,
-            limit=100,
-        )[0]
+        # Get vectors for the source file, by ID when state knows the file.
+        # The IDs can be stale (collection rebuilt elsewhere, state file
+        # copied from another machine), so fall back to matching on path
+        chunk_ids = self.state.chunk_ids(source_path)
+        source_points = []
+        if chunk_ids:
+            source_points = self.client.retrieve(
+                collection_name=self.config.collection_name,
+                ids=chunk_ids if average else chunk_ids[:1],
+                with_payload=False,
+                with_vectors=True,
+            )
+        if not source_points:
+            source_points = self.client.scroll(
+                collection_name=self.config.collection_name,
+                scroll_filter=Filter(
+                    must=[
+                        FieldCondition(
+                            key="path",
+                            match=MatchValue(value=source_path),
+                        )
+                    ]
+                ),
+                with_payload=False,
+                with_vectors=True,
+                limit=100 if average else 1,
+            )[0]
         
         if not source_points:
             return []
         
-        # Use the first chunk's vector as representative
-        # (could also average all vectors or use centroid)
-        source_vector = source_points[0].vector
+        if average:
+            source_vector = np.mean([p.vector for p in source_points], axis=0)
+        else:
+            source_vector = source_points[0].vector
         
         # Build exclusion filter
         search_filter = None
@@ -1,12 +1,63 @@
 """File system walker with gitignore-style exclusions."""
 
 import json
+import os
+import re
+import sys
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass, field
+from functools import lru_cache
 from pathlib import Path
-from typing import Iterator, Optional
+from typing import Iterable, Iterator, KeysView, Optional
 import xxhash
 import pathspec
 
+try:
+    import orjson
+except ImportError:  # fall back to the stdlib json module
+    orjson = None
+
+
+# Files are hashed in blocks of this size; smaller files in a single read
+HASH_BLOCK_SIZE = 1 << 20
+SMALL_FILE_SIZE = 4096
+
+# Files with a NUL byte in their first this many bytes are taken as binary
+BINARY_SNIFF_SIZE = 8000
+
+# Read-ahead hints are only available on POSIX systems
+_fadvise = getattr(os, "posix_fadvise", None)
+
+# pathspec names a group in every pattern's regex; the names clash once
+# the patterns are joined, and the groups aren't needed for matching
+_NAMED_GROUP = re.compile(r'\(\?P<\w+>')
+
+
+def _compile_excludes(spec: pathspec.PathSpec) -> Optional[re.Pattern]:
+    """Fuse a spec's patterns into one regex matching any of them.
+    
+    Only valid when no pattern is negated: with '!' patterns the last
+    match wins, which needs pathspec's ordered evaluation.
+    
+    Returns:
+        The combined regex, or None if the spec can't be fused
+    """
+    regexes = []
+    for pattern in spec.patterns:
+        if pattern.include is None:
+            continue              # comment or blank line
+        if not pattern.include or pattern.regex is None:
+            return None
+        regexes.append(_NAMED_GROUP.sub('(?:', pattern.regex.pattern))
+    
+    if not regexes:
+        return None
+    try:
+        return re.compile('|'.join(f'(?:{r})' for r in regexes))
+    except re.error:
+        return None
+
 
 @dataclass
 class FileInfo:
@@ -16,81 +67,318 @@ class FileInfo:
     relative_path: str          # Path relative to vault root
     mtime: float               # Modification time
     size: int                  # File size in bytes
-    content_hash: str = ""     # Hash of content for change detection
+    content_hash: int = 0      # 64-bit hash of content for change detection
+    binary: bool = False       # NUL bytes near the start, set by compute_hash
+    raw: Optional[bytes] = field(default=None, repr=False, compare=False)  # Content, once loaded
+    
+    def load(self) -> bytes:
+        """Read the file's content into raw, so it is read only once.
+        
+        compute_hash and the chunker use raw when it is set; callers
+        reset it to None once done, to bound memory.
+        """
+        self.raw = self.path.read_bytes()
+        return self.raw
+    
+    def text(self) -> str:
+        """Decode the content as read_text would, from raw if loaded.
+        
+        Line endings are normalized to newlines, like text-mode reads.
+        """
+        if self.raw is None:
+            return self.path.read_text(encoding='utf-8', errors='replace')
+        content = self.raw.decode('utf-8', errors='replace')
+        if '\r' in content:
+            content = content.replace('\r\n', '\n').replace('\r', '\n')
+        return content
     
-    def compute_hash(self) -> str:
-        """Compute content hash."""
-        content = self.path.read_text(encoding='utf-8', errors='replace')
-        self.content_hash = xxhash.xxh64(content.encode()).hexdigest()
+    def compute_hash(self) -> int:
+        """Compute content hash.
+        
+        Hashes the raw bytes with XXH3, kept as a 64-bit int (format it
+        with :016x for the usual hex digest). Larger files are streamed in
+        HASH_BLOCK_SIZE blocks so memory stays flat regardless of file
+        size. Files are read rather than memory-mapped: a mapped file
+        truncated mid-hash (editors and sync tools do this) raises SIGBUS,
+        which can't be caught.
+        
+        Also sets binary from the bytes already read, as git does: a NUL
+        in the first BINARY_SNIFF_SIZE bytes marks the file as binary.
+        """
+        if self.raw is not None:
+            self.binary = b'\0' in self.raw[:BINARY_SNIFF_SIZE]
+            self.content_hash = xxhash.xxh3_64_intdigest(self.raw)
+            return self.content_hash
+        
+        with self.path.open('rb', buffering=0) as f:
+            if self.size < SMALL_FILE_SIZE:
+                # read() with no size reads to EOF, even if the file grew
+                data = f.read()
+                self.binary = b'\0' in data[:BINARY_SNIFF_SIZE]
+                self.content_hash = xxhash.xxh3_64_intdigest(data)
+                return self.content_hash
+            
+            # Ask the kernel for aggressive read-ahead, so the next block is
+            # usually in the page cache by the time it is read
+            if _fadvise is not None:
+                _fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            
+            hasher = xxhash.xxh3_64()
+            block = f.read(HASH_BLOCK_SIZE)
+            self.binary = b'\0' in block[:BINARY_SNIFF_SIZE]
+            while block:
+                hasher.update(block)
+                block = f.read(HASH_BLOCK_SIZE)
+        
+        self.content_hash = hasher.intdigest()
         return self.content_hash
 
 
+def _hash_file(file_info: FileInfo, load: bool = False) -> Optional[str]:
+    """Compute a file's content hash; returns the error message on failure."""
+    try:
+        if load:
+            file_info.load()
+        file_info.compute_hash()
+        return None
+    except Exception as e:
+        return str(e)
+
+
+def hash_all(
+    file_infos: Iterable[FileInfo],
+    workers: Optional[int] = None,
+    load: bool = False,
+) -> Iterator[tuple[FileInfo, Optional[str]]]:
+    """Hash files on a thread pool.
+    
+    Reads block and xxhash releases the GIL, so threads overlap both the
+    disk and the hashing. Results come back in input order as they are
+    ready, so callers can start on the first files before the rest are
+    hashed. At most two files per thread are in flight ahead of the
+    caller, which bounds memory when content is kept.
+    
+    Args:
+        file_infos: Files to hash; content_hash is set on each
+        workers: Number of threads; defaults to twice the CPU count, at most 32
+        load: Keep each file's content in raw (see FileInfo.load), for
+            callers that go on to read it
+        
+    Yields:
+        (file_info, error) per file, error being None on success
+    """
+    if workers is None:
+        workers = min(32, (os.cpu_count() or 4) * 2)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        in_flight: deque[tuple[FileInfo, Future]] = deque()
+        for file_info in file_infos:
+            in_flight.append((file_info, pool.submit(_hash_file, file_info, load)))
+            if len(in_flight) >= 2 * workers:
+                file_info, future = in_flight.popleft()
+                yield file_info, future.result()
+        while in_flight:
+            file_info, future = in_flight.popleft()
+            yield file_info, future.result()
+
+
 @dataclass
 class IndexState:
-    """Tracks indexed files for incremental updates."""
+    """Tracks indexed files for incremental updates.
+    
+    Per-file fields are kept in parallel dicts keyed by relative path
+    rather than one small dict per file, which keeps large states
+    compact in memory and on disk.
+    """
     
-    files: dict[str, dict] = field(default_factory=dict)  # relative_path -> {hash, mtime, chunk_ids}
+    hashes: dict[str, int] = field(default_factory=dict)        # relative_path -> content hash
+    mtimes: dict[str, float] = field(default_factory=dict)      # relative_path -> mtime when indexed
+    sizes: dict[str, int] = field(default_factory=dict)         # relative_path -> size when indexed
+    chunks: dict[str, list[str]] = field(default_factory=dict)  # relative_path -> chunk IDs
     collection_name: str = ""
     model_name: str = ""
     last_indexed: Optional[float] = None
     
     @classmethod
     def load(cls, path: Path) -> "IndexState":
-        """Load state from file."""
+        """Load state from file.
+        
+        State saved as one dict per file, before the parallel layout, is
+        converted on load.
+        """
         if not path.exists():
             return cls()
         
         try:
-            data = json.loads(path.read_text())
-            return cls(
-                files=data.get("files", {}),
+            raw = path.read_bytes()
+            data = orjson.loads(raw) if orjson is not None else json.loads(raw)
+            # Each decoded dict has its own copy of every path; interning
+            # makes them (and later walks) share one string per path
+            intern = sys.intern
+            state = cls(
+                hashes={intern(k): _parse_hash(v) for k, v in data.get("hashes", {}).items()},
+                mtimes={intern(k): v for k, v in data.get("mtimes", {}).items()},
+                sizes={intern(k): v for k, v in data.get("sizes", {}).items()},
+                chunks={intern(k): v for k, v in data.get("chunk_ids", {}).items()},
                 collection_name=data.get("collection_name", ""),
                 model_name=data.get("model_name", ""),
                 last_indexed=data.get("last_indexed"),
             )
-        except (json.JSONDecodeError, KeyError):
+            for relative_path, stored in data.get("files", {}).items():
+                relative_path = intern(relative_path)
+                state.hashes[relative_path] = _parse_hash(stored.get("hash"))
+                state.chunks[relative_path] = stored.get("chunk_ids", [])
+                if "mtime" in stored:
+                    state.mtimes[relative_path] = stored["mtime"]
+                if "size" in stored:
+                    state.sizes[relative_path] = stored["size"]
+            return state
+        except (json.JSONDecodeError, KeyError, AttributeError):
             return cls()
     
     def save(self, path: Path):
-        """Save state to file."""
+        """Save state to file.
+        
+        Written compactly to a temporary file that then replaces the old
+        state, so a crash mid-write never leaves a truncated state behind.
+        orjson and the stdlib fallback differ in whitespace and escaping,
+        so only the decoded content is stable, not the bytes.
+        """
         import time
         self.last_indexed = time.time()
         
         data = {
-            "files": self.files,
+            "hashes": self.hashes,
+            "mtimes": self.mtimes,
+            "sizes": self.sizes,
+            "chunk_ids": self.chunks,
             "collection_name": self.collection_name,
             "model_name": self.model_name,
             "last_indexed": self.last_indexed,
         }
-        path.write_text(json.dumps(data, indent=2))
+        if orjson is not None:
+            encoded = orjson.dumps(data)
+        else:
+            encoded = json.dumps(data, separators=(",", ":")).encode()
+        
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(encoded)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    
+    def __len__(self) -> int:
+        """Number of indexed files."""
+        return len(self.hashes)
+    
+    def paths(self) -> KeysView[str]:
+        """View of the indexed files' relative paths."""
+        return self.hashes.keys()
+    
+    def stat_unchanged(self, file_info: FileInfo) -> bool:
+        """Check whether a file's mtime and size match the indexed version.
+        
+        A match means the content can be assumed unchanged without reading
+        the file. State written before sizes were recorded never matches.
+        """
+        relative_path = file_info.relative_path
+        return (
+            self.mtimes.get(relative_path) == file_info.mtime
+            and self.sizes.get(relative_path) == file_info.size
+        )
     
     def needs_reindex(self, file_info: FileInfo) -> bool:
         """Check if a file needs to be reindexed."""
-        stored = self.files.get(file_info.relative_path)
-        if not stored:
-            return True
-        
-        # Check if content hash changed
-        if stored.get("hash") != file_info.content_hash:
-            return True
-        
-        return False
+        # Missing files have no stored hash, so they compare unequal too
+        return self.hashes.get(file_info.relative_path) != file_info.content_hash
     
     def update_file(self, file_info: FileInfo, chunk_ids: list[str]):
         """Update state for a file."""
-        self.files[file_info.relative_path] = {
-            "hash": file_info.content_hash,
-            "mtime": file_info.mtime,
-            "chunk_ids": chunk_ids,
-        }
+        relative_path = sys.intern(file_info.relative_path)
+        self.hashes[relative_path] = file_info.content_hash
+        self.mtimes[relative_path] = file_info.mtime
+        self.sizes[relative_path] = file_info.size
+        self.chunks[relative_path] = chunk_ids
+    
+    def refresh_stat(self, file_info: FileInfo):
+        """Record a file's current mtime and size, its content unchanged.
+        
+        Called when a file was touched but hashes the same, so the next
+        run can skip it by stat alone instead of hashing it again.
+        """
+        self.mtimes[file_info.relative_path] = file_info.mtime
+        self.sizes[file_info.relative_path] = file_info.size
+    
+    def chunk_ids(self, relative_path: str) -> list[str]:
+        """Get a file's chunk IDs in chunk order, empty if not indexed."""
+        return self.chunks.get(relative_path, [])
     
     def remove_file(self, relative_path: str) -> list[str]:
         """Remove a file from state, returning its chunk IDs."""
-        if relative_path in self.files:
-            chunk_ids = self.files[relative_path].get("chunk_ids", [])
-            del self.files[relative_path]
-            return chunk_ids
-        return []
+        self.hashes.pop(relative_path, None)
+        self.mtimes.pop(relative_path, None)
+        self.sizes.pop(relative_path, None)
+        return self.chunks.pop(relative_path, [])
+
+
+def _parse_hash(value) -> int:
+    """Read a stored hash; state from before int hashes holds hex strings.
+    
+    Unreadable values become 0, which no current hash compares equal to
+    in practice, so those files are simply rehashed and reindexed.
+    """
+    if isinstance(value, int):
+        return value
+    try:
+        return int(value, 16)
+    except (TypeError, ValueError):
+        return 0
+
+
+# Compiled exclude specs kept for reuse; bounded so a long-lived process
+# indexing many vaults doesn't keep every spec it has seen
+SPEC_CACHE_SIZE = 32
+
+
+def _load_excludes(
+    exclude_patterns: list[str],
+    gitignore_path: Path,
+) -> tuple[pathspec.PathSpec, Optional[re.Pattern]]:
+    """Compile exclude patterns plus .gitignore into one spec, cached.
+    
+    The cache is keyed on the .gitignore's mtime, so an edited file is
+    compiled again.
+    
+    Returns:
+        (spec, regex), regex being None when the spec can't be fused
+    """
+    try:
+        gitignore_mtime = gitignore_path.stat().st_mtime_ns
+    except OSError:
+        gitignore_mtime = None
+    
+    return _compile_excludes_cached(tuple(exclude_patterns), str(gitignore_path), gitignore_mtime)
+
+
+@lru_cache(maxsize=SPEC_CACHE_SIZE)
+def _compile_excludes_cached(
+    exclude_patterns: tuple[str, ...],
+    gitignore_path: str,
+    gitignore_mtime: Optional[int],
+) -> tuple[pathspec.PathSpec, Optional[re.Pattern]]:
+    """Build the spec for _load_excludes.
+    
+    Both sources go into a single pattern list, deduplicated keeping each
+    pattern's last occurrence, since with negations the last match wins.
+    Without negations, the patterns are also fused into one regex.
+    """
+    lines = list(exclude_patterns)
+    if gitignore_mtime is not None:
+        lines += Path(gitignore_path).read_text().splitlines()
+    lines = list(reversed(dict.fromkeys(reversed(lines))))
+    
+    spec = pathspec.PathSpec.from_lines(pathspec.patterns.GitWildMatchPattern, lines)
+    return spec, _compile_excludes(spec)
 
 
 class VaultWalker:
@@ -101,6 +389,7 @@ class VaultWalker:
         vault_path: Path,
         include_extensions: list[str],
         exclude_patterns: list[str],
+        max_file_bytes: int = 10 << 20,
     ):
         """Initialize walker.
         
@@ -108,71 +397,138 @@ class VaultWalker:
             vault_path: Root path of the vault
             include_extensions: File extensions to include (e.g., ['.md'])
             exclude_patterns: Gitignore-style patterns to exclude
+            max_file_bytes: Skip files larger than this; 0 for no limit
         """
         self.vault_path = vault_path.resolve()
+        self.max_file_bytes = max_file_bytes
         self.include_extensions = set(ext.lower() for ext in include_extensions)
+        # Extensions are matched on the lowercased tail of each name, as
+        # long as the longest extension
+        self._ext_tuple = tuple(self.include_extensions)
+        self._ext_tail = max((len(ext) for ext in self._ext_tuple), default=0)
         
-        # Build pathspec from exclude patterns
-        self.exclude_spec = pathspec.PathSpec.from_lines(
-            pathspec.patterns.GitWildMatchPattern,
-            exclude_patterns
+        # Compiled patterns are shared by walkers with the same config and
+        # .gitignore, so rescans don't parse them again
+        self.exclude_spec, self._exclude_re = _load_excludes(
+            exclude_patterns, self.vault_path / ".gitignore"
         )
+        # Comments and blank lines compile to no-op patterns
+        self._has_excludes = any(p.include is not None for p in self.exclude_spec.patterns)
+        # A '!' pattern can re-include a file below an excluded directory,
+        # so directories are only pruned when there are none
+        self._has_negations = any(p.include is False for p in self.exclude_spec.patterns)
         
-        # Also load .gitignore if present
-        gitignore_path = self.vault_path / ".gitignore"
-        if gitignore_path.exists():
-            gitignore_patterns = gitignore_path.read_text().splitlines()
-            gitignore_spec = pathspec.PathSpec.from_lines(
-                pathspec.patterns.GitWildMatchPattern,
-                gitignore_patterns
-            )
-            self.exclude_spec = self.exclude_spec + gitignore_spec
+        # Directory decisions are cached per walker, so repeated walks
+        # (find_deleted without live paths, watch-style reindexing) match
+        # each directory against the patterns only once
+        self._dir_excluded = lru_cache(maxsize=8192)(self._match_dir)
+    
+    def _excluded(self, relative_path: str) -> bool:
+        """Check a path relative to the vault against the exclude patterns."""
+        if self._exclude_re is None:
+            return self.exclude_spec.match_file(relative_path)
+        if os.sep != "/":
+            relative_path = relative_path.replace(os.sep, "/")
+        return self._exclude_re.match(relative_path) is not None
+    
+    def _match_dir(self, rel_dir: str) -> bool:
+        """Check a directory, relative to the vault, against the exclude patterns.
+        
+        The trailing slash gives patterns like 'build/' their
+        directory-only meaning.
+        """
+        return self._excluded(rel_dir + "/")
     
     def walk(self) -> Iterator[FileInfo]:
         """Walk vault and yield files to index.
         
+        Excluded directories are pruned before they are descended into,
+        so ignored trees like .git or node_modules are never listed. With
+        negated ('!') patterns nothing is pruned and every file is matched
+        on its own, so a negation can re-include a file whose directory is
+        excluded. Directories are listed with os.scandir, whose entries carry the
+        file type from the listing, so the only stat per file is the one
+        for its mtime and size.
+        
+        Per-walk decisions are made once up front: without exclude
+        patterns no path is matched at all, and the loop works on locals.
+        
         Yields:
             FileInfo objects for each file to index
         """
-        for path in self.vault_path.rglob("*"):
-            if not path.is_file():
-                continue
-            
-            # Check extension
-            if path.suffix.lower() not in self.include_extensions:
-                continue
-            
-            # Get relative path for pattern matching
-            relative = path.relative_to(self.vault_path)
-            relative_str = str(relative)
-            
-            # Check exclusions
-            if self.exclude_spec.match_file(relative_str):
-                continue
-            
-            # Build file info
-            stat = path.stat()
-            file_info = FileInfo(
-                path=path,
-                relative_path=relative_str,
-                mtime=stat.st_mtime,
-                size=stat.st_size,
-            )
+        excluded = self._excluded if self._has_excludes else None
+        prune = self._has_excludes and not self._has_negations
+        dir_excluded = self._dir_excluded if prune else None
+        ext_tuple = self._ext_tuple
+        ext_tail = self._ext_tail
+        max_file_bytes = self.max_file_bytes
+        join = os.path.join
+        intern = sys.intern
+        
+        # (absolute directory, directory relative to the vault)
+        stack = [(str(self.vault_path), "")]
+        while stack:
+            dir_path, rel_dir = stack.pop()
+            try:
+                entries = os.scandir(dir_path)
+            except OSError:
+                continue              # vanished or unreadable, as os.walk skips it
             
-            yield file_info
+            with entries:
+                for entry in entries:
+                    name = entry.name
+                    try:
+                        # Symlinked directories aren't followed; symlinked
+                        # files are, and broken links are skipped
+                        if entry.is_dir(follow_symlinks=False):
+                            rel_path = join(rel_dir, name)
+                            # Prune excluded directories; nothing below
+                            # them is listed or matched
+                            if dir_excluded is None or not dir_excluded(rel_path):
+                                stack.append((entry.path, rel_path))
+                            continue
+                        if not entry.is_file():
+                            continue
+                    except OSError:
+                        continue
+                    
+                    # Check extension
+                    if not name[-ext_tail:].lower().endswith(ext_tuple):
+                        continue
+                    
+                    # Check exclusions against the path relative to the vault
+                    relative_str = intern(join(rel_dir, name))
+                    if excluded is not None and excluded(relative_str):
+                        continue
+                    
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    
+                    # Oversized files (exports, pasted dumps) would stall
+                    # hashing and chunking for little search value
+                    if max_file_bytes and st.st_size > max_file_bytes:
+                        continue
+                    
+                    yield FileInfo(
+                        path=Path(entry.path),
+                        relative_path=relative_str,
+                        mtime=st.st_mtime,
+                        size=st.st_size,
+                    )
     
-    def find_deleted(self, state: IndexState) -> list[str]:
-        """Find files that were indexed but no longer exist.
+    def find_deleted(self, state: IndexState, live_paths: Optional[set[str]] = None) -> list[str]:
+        """Find files that were indexed but are no longer walked.
         
         Args:
             state: Current index state
+            live_paths: Relative paths from a walk() the caller already did;
+                the vault is walked again if not given
             
         Returns:
             List of relative paths that were deleted
         """
-        deleted = []
-        for relative_path in state.files:
-            full_path = self.vault_path / relative_path
-            if not full_path.exists():
-                deleted.append(relative_path)
-        return deleted
+        if live_paths is None:
+            live_paths = {file_info.relative_path for file_info in self.walk()}
+        return list(state.paths() - live_paths)
@@ -0,0 +1,73 @@
+"""Tests for IndexState persistence."""
+
+import json
+
+from src.walker import FileInfo, IndexState
+
+
+def _baseline_state() -> dict:
+    """State as written before the per-field layout: one dict per file."""
+    return {
+        "files": {
+            "notes/a.md": {
+                "hash": "9f86d081884c7d65",
+                "mtime": 1700000000.5,
+                "chunk_ids": ["id-a-0", "id-a-1"],
+            },
+            "b.md": {
+                "hash": "2c26b46b68ffc68f",
+                "mtime": 1700000100.0,
+                "chunk_ids": ["id-b-0"],
+            },
+        },
+        "collection_name": "vault_work",
+        "model_name": "taylorai/bge-micro-v2",
+        "last_indexed": 1700000200.0,
+    }
+
+
+def test_load_baseline_layout(tmp_path):
+    path = tmp_path / "state.json"
+    path.write_text(json.dumps(_baseline_state(), indent=2))
+    
+    state = IndexState.load(path)
+    
+    assert set(state.paths()) == {"notes/a.md", "b.md"}
+    assert state.mtimes == {"notes/a.md": 1700000000.5, "b.md": 1700000100.0}
+    assert state.chunk_ids("notes/a.md") == ["id-a-0", "id-a-1"]
+    assert state.chunk_ids("b.md") == ["id-b-0"]
+    assert state.hashes["notes/a.md"] == 0x9f86d081884c7d65
+    assert state.collection_name == "vault_work"
+    assert state.model_name == "taylorai/bge-micro-v2"
+
+
+def test_baseline_files_reindex_once(tmp_path):
+    # Old hashes were xxh64 of the decoded text; current ones are xxh3 of
+    # the raw bytes, so upgraded files are reindexed on the first run
+    note = tmp_path / "b.md"
+    note.write_text("hello")
+    path = tmp_path / "state.json"
+    path.write_text(json.dumps(_baseline_state(), indent=2))
+    
+    state = IndexState.load(path)
+    file_info = FileInfo(path=note, relative_path="b.md", mtime=1700000100.0, size=5)
+    file_info.compute_hash()
+    
+    # Old state has no sizes, so the stat shortcut never applies
+    assert not state.stat_unchanged(file_info)
+    assert state.needs_reindex(file_info)
+
+
+def test_save_round_trip(tmp_path):
+    path = tmp_path / "state.json"
+    path.write_text(json.dumps(_baseline_state(), indent=2))
+    state = IndexState.load(path)
+    
+    state.save(path)
+    reloaded = IndexState.load(path)
+    
+    assert reloaded.hashes == state.hashes
+    assert reloaded.mtimes == state.mtimes
+    assert reloaded.sizes == state.sizes
+    assert reloaded.chunks == state.chunks
+    assert "files" not in json.loads(path.read_bytes())
@@ -0,0 +1,76 @@
+"""Tests for VaultWalker."""
+
+import os
+
+import pathspec
+import pytest
+
+from src.walker import VaultWalker
+
+
+TREE = [
+    "x.md",
+    "a/y.MD",
+    "a/t.txt",
+    "a/b/z.md",
+    ".git/q.md",
+    "node_modules/x/n.md",
+    "_tmp/u.md",
+    "archive/old.md",
+    "archive/keep.md",
+    "deep/archive/d.md",
+    "notes/n1.md",
+    "notes/sub/n2.md",
+    "drafts/d.md",
+    "drafts/keep/k.md",
+]
+
+
+@pytest.fixture
+def vault(tmp_path):
+    for relative_path in TREE:
+        path = tmp_path / relative_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(f"# {relative_path}\n")
+    return tmp_path
+
+
+def _expected(root, lines: list[str]) -> set[str]:
+    """Files a plain PathSpec.match_file filter keeps, no pruning."""
+    spec = pathspec.PathSpec.from_lines(pathspec.patterns.GitWildMatchPattern, lines)
+    kept = set()
+    for dir_path, _, names in os.walk(root):
+        for name in names:
+            relative_path = os.path.relpath(os.path.join(dir_path, name), root)
+            if name.lower().endswith(".md") and not spec.match_file(relative_path):
+                kept.add(relative_path)
+    return kept
+
+
+@pytest.mark.parametrize("patterns", [
+    [],
+    [".*", "_*", "node_modules"],
+    ["archive/"],
+    ["archive"],
+    ["archive", "!archive/keep.md"],
+    ["drafts/", "!drafts/keep/"],
+    ["*.md", "!notes/**/*.md"],
+    [".*", "a", "!a/b/z.md", "deep/"],
+])
+def test_walk_matches_pathspec(vault, patterns):
+    walker = VaultWalker(vault, [".md"], patterns, max_file_bytes=0)
+    
+    walked = {file_info.relative_path for file_info in walker.walk()}
+    
+    assert walked == _expected(vault, patterns)
+
+
+def test_walk_applies_gitignore_negations(vault):
+    (vault / ".gitignore").write_text("archive\n!archive/keep.md\n")
+    walker = VaultWalker(vault, [".md"], [".*"], max_file_bytes=0)
+    
+    walked = {file_info.relative_path for file_info in walker.walk()}
+    
+    assert walked == _expected(vault, [".*", "archive", "!archive/keep.md"])
+    assert "archive/keep.md" in walked
+    assert "archive/old.md" not in walked